@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the hot paths: polynomial products, building A for compute_pq_rank, the upperbound_rank
+system on the get_rank.py families and the main CNF of quadprod.py.
+
+Every benchmark runs on fixed inputs and reports the best wall time over --repeat runs together with
+size statistics, so runs on different revisions are comparable. The results are written as JSON; with
+--baseline a previous result file is compared against and every benchmark slower by more than
+--tolerance is reported as a regression. Benchmarks of the Sage backend are only run when Sage imports.
+
+    python benchmarks.py --output new.json --baseline old.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from random import Random
+from typing import Callable, Dict, List, Tuple
+
+BENCHMARKS: List[Tuple[str, Callable[[], Tuple[Callable[[], object], Dict]]]] = []
+
+
+def benchmark(name: str):
+    """
+    Registers a setup function under name. The setup builds the inputs and returns the function to time
+    and a dict of statistics describing the inputs.
+    """
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def sage_available() -> bool:
+    try:
+        import sage.all  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def random_polynomial(rng: Random, n: int, num_terms: int) -> List[Tuple[int, ...]]:
+    from compute_pq_rank import populate_monomials_list
+    return sorted(rng.sample(populate_monomials_list(n), num_terms))
+
+
+for num_terms in [50, 400]:
+    @benchmark("multiply_polynomials/terms=" + str(num_terms))
+    def _(num_terms=num_terms):
+        from compute_pq_rank import multiply_polynomials
+        rng = Random(num_terms)
+        p, q = random_polynomial(rng, 24, num_terms), random_polynomial(rng, 24, num_terms)
+        return lambda: multiply_polynomials(p, q), {"terms": num_terms}
+
+
+for n, num_terms in [(16, 2000), (20, 4000)]:
+    for method in ["sparse", "truth_table"]:
+        @benchmark("multiply_many/" + method + "/n=" + str(n))
+        def _(n=n, num_terms=num_terms, method=method):
+            from polynomial import multiply_many, Polynomial
+            rng = Random(n)
+            p, *qs = [Polynomial.from_masks(rng.sample(range(1 << n), num_terms)) for _ in range(5)]
+            return lambda: multiply_many(p, qs, method), {"terms": num_terms, "qs": len(qs)}
+
+
+@benchmark("populate_monomials_list/n=40")
+def _():
+    from compute_pq_rank import populate_monomials_list
+    return lambda: populate_monomials_list(40), {"monomials": len(populate_monomials_list(40))}
+
+
+SEARCH_P = [(0, 1, 2), (0, 3), (1, 4), (2, 3, 4), (1, 2), (4,)]
+
+for n in [12, 16, 20]:
+    @benchmark("generate_equations/n=" + str(n))
+    def _(n=n):
+        from compute_pq_rank import generate_equations
+        A_high, A_low = generate_equations(n, SEARCH_P)
+        stats = {"rows_high": len(A_high[0]) - 1, "rows_low": len(A_low[0]) - 1, "nnz": len(A_high[1]) + len(A_low[1])}
+        return lambda: generate_equations(n, SEARCH_P), stats
+
+    @benchmark("MultiplyingMatrixBuilder.grow/n=" + str(n))
+    def _(n=n):
+        from compute_pq_rank import MultiplyingMatrixBuilder
+
+        def grow():
+            # one variable at a time, as sweep_seed does
+            builder = MultiplyingMatrixBuilder(SEARCH_P)
+            for m in range(5, n + 1):
+                builder.grow(m)
+            return builder
+        builder = grow()
+        return grow, {"ncols": builder.ncols, "rows_high": builder.rows_high, "rows_low": builder.rows_low}
+
+    @benchmark("create_multiplying_matrix_sage/n=" + str(n))
+    def _(n=n):
+        if not sage_available():
+            return None
+        from compute_pq_rank import MultiplyingMatrixBuilder, create_multiplying_matrix
+        builder = MultiplyingMatrixBuilder(SEARCH_P)
+        builder.grow(n)
+        return lambda: create_multiplying_matrix(n, builder.high, builder.low, "sage"), {"ncols": builder.ncols}
+
+    @benchmark("calculate_dims/n=" + str(n))
+    def _(n=n):
+        from compute_pq_rank import calculate_dims, generate_equations
+        A_high, A_low = generate_equations(n, SEARCH_P)
+        dim_of_qs, dim_of_prod, _ = calculate_dims(n, A_high, A_low)
+        return lambda: calculate_dims(n, A_high, A_low), {"dim_of_qs": dim_of_qs, "dim_of_prod": dim_of_prod}
+
+    @benchmark("calculate_dims_wiedemann/n=" + str(n))
+    def _(n=n):
+        from compute_pq_rank import calculate_dims, generate_equations
+        A_high, A_low = generate_equations(n, SEARCH_P)
+        dim_of_qs, dim_of_prod, _ = calculate_dims(n, A_high, A_low, backend="wiedemann")
+        return lambda: calculate_dims(n, A_high, A_low, backend="wiedemann"), {"dim_of_qs": dim_of_qs, "dim_of_prod": dim_of_prod}
+
+for n in [28, 40, 48, 60]:
+    @benchmark("upperbound_rank/n=" + str(n))
+    def _(n=n):
+        from get_rank import FAMILIES
+        from upperbound import upperbound_rank
+        p = FAMILIES[n]
+        return lambda: upperbound_rank(n, p), {"pairs": len(p), "rank": upperbound_rank(n, p)}
+
+    @benchmark("upperbound_rank_by_blocks/n=" + str(n))
+    def _(n=n):
+        from get_rank import FAMILIES
+        from upperbound import upperbound_rank
+        p = FAMILIES[n]
+        return lambda: upperbound_rank(n, p, blocks=True, processes=1), {"pairs": len(p)}
+
+    @benchmark("upperbound_rank_wiedemann/n=" + str(n))
+    def _(n=n):
+        from get_rank import FAMILIES
+        from upperbound import upperbound_rank
+        p = FAMILIES[n]
+        return lambda: upperbound_rank(n, p, backend="wiedemann"), {"pairs": len(p)}
+
+    @benchmark("upperbound_rank_sage/n=" + str(n))
+    def _(n=n):
+        if n > 40 or not sage_available():
+            return None
+        from get_rank import FAMILIES
+        from upperbound import upperbound_rank
+        p = FAMILIES[n]
+        return lambda: upperbound_rank(n, p, backend="sage"), {"pairs": len(p)}
+
+for n in [10, 20, 30]:
+    for encoding in ["direct", "tseitin"]:
+        @benchmark("generate_main_cnf/" + encoding + "/n=" + str(n))
+        def _(n=n, encoding=encoding):
+            from quadprod import generate_main_cnf
+            cnf, id_pool, _ = generate_main_cnf(n, encoding)
+            stats = {"clauses": len(cnf), "literals": sum(map(len, cnf)), "variables": id_pool.top}
+            return lambda: generate_main_cnf(n, encoding), stats
+
+
+def run(pattern: str = "", repeat: int = 3) -> Dict[str, Dict]:
+    results = {}
+    for name, setup in BENCHMARKS:
+        if pattern not in name:
+            continue
+        try:
+            prepared = setup()
+        except ImportError as e:
+            print(name, "skipped:", e, file=sys.stderr)
+            continue
+        if prepared is None:
+            continue
+        function, stats = prepared
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        results[name] = {"seconds": min(times), "runs": times, **stats}
+        print("%-45s %10.4fs" % (name, min(times)), file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> Dict[str, Dict]:
+    """
+    The speedup baseline/current of every benchmark present in both, flagged as a regression when the current
+    run is slower than the baseline by more than the tolerance, or when a size statistic changed
+    """
+    comparison = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        speedup = old["seconds"] / result["seconds"] if result["seconds"] > 0 else float("inf")
+        changed = sorted(key for key in result if key not in ("seconds", "runs") and key in old and old[key] != result[key])
+        comparison[name] = {"baseline_seconds": old["seconds"], "seconds": result["seconds"], "speedup": speedup,
+                            "regression": speedup < 1 / (1 + tolerance) or bool(changed), "changed": changed}
+    return comparison
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default="benchmarks.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--filter", default="", help="only run the benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown before a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.repeat)
+    report = {"python": platform.python_version(), "machine": platform.machine(), "sage": sage_available(),
+              "results": results}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        report["comparison"] = compare(results, baseline, args.tolerance)
+        for name, entry in report["comparison"].items():
+            print("%-45s %8.2fx%s" % (name, entry["speedup"], "  REGRESSION" if entry["regression"] else ""),
+                  file=sys.stderr)
+            if entry["regression"]:
+                regressions.append(name)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Canonical forms of polynomials p, q in pairs x_i * x_j up to renaming the variables.
+
+The pair (p, q) is seen as the complete graph on the n variables whose edge {i, j} carries the letter
+print_tex prints: '.', 'P', 'Q' or 'B'. The canonical form is the smallest adjacency grid over the vertex
+orderings reached by individualization-refinement: colour refinement splits the vertices by their
+coloured neighbourhoods, the first smallest non-trivial cell is individualized vertex by vertex and
+the search recurses until the colouring is discrete. Twins inside a cell, whose swap is an
+automorphism, lead to the same leaves, so only one of them is tried.
+Polynomials with monomials of other degrees are canonized the same way through their incidence graph.
+"""
+
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+EDGE_LETTERS = ".PQB"
+EDGE_P = 1
+EDGE_Q = 2
+
+
+def letter_grid(n: int, p: Iterable[Tuple[int, int]], q: Iterable[Tuple[int, int]] = ()) -> np.ndarray:
+    """
+    The symmetric n x n grid with EDGE_P set on the pairs of p and EDGE_Q on the pairs of q
+    """
+    grid = np.zeros((n, n), dtype=np.int8)
+    for edges, bit in [(p, EDGE_P), (q, EDGE_Q)]:
+        edges = np.array(list(edges), dtype=np.int64).reshape(-1, 2)
+        grid[edges[:, 0], edges[:, 1]] |= bit
+        grid[edges[:, 1], edges[:, 0]] |= bit
+    return grid
+
+
+def refine(grid: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    """
+    Colour refinement: a vertex is recoloured by its colour and the number of neighbours of every
+    colour along every edge letter, until the number of colours is stable. New colours are the ranks of
+    the sorted signatures, so the result does not depend on the labelling.
+    """
+    n = len(grid)
+    while True:
+        num_colors = int(colors.max()) + 1
+        counts = np.zeros((n, len(EDGE_LETTERS) * num_colors), dtype=np.int64)
+        rows = np.repeat(np.arange(n), n)
+        np.add.at(counts, (rows, grid.ravel().astype(np.int64) * num_colors + np.tile(colors, n)), 1)
+        _, refined = np.unique(np.column_stack((colors, counts)), axis=0, return_inverse=True)
+        refined = refined.ravel()
+        if refined.max() + 1 == num_colors:
+            return refined
+        colors = refined
+
+
+def _twins(grid: np.ndarray, u: int, v: int) -> bool:
+    rest = np.ones(len(grid), dtype=bool)
+    rest[[u, v]] = False
+    return np.array_equal(grid[u, rest], grid[v, rest])
+
+
+def canonical_order(grid: np.ndarray, colors: np.ndarray = None) -> np.ndarray:
+    """
+    The ordering of the vertices giving the smallest grid, order[i] is the vertex placed at position i.
+    Vertices can be given initial colors, the ordering then lists them by increasing color.
+    """
+    n = len(grid)
+    best = [None, None]
+
+    def search(colors):
+        colors = refine(grid, colors)
+        if colors.max() + 1 == n:
+            order = np.argsort(colors)
+            certificate = grid[np.ix_(order, order)].tobytes()
+            if best[0] is None or certificate < best[0]:
+                best[0], best[1] = certificate, order
+            return
+        sizes = np.bincount(colors)
+        cell = int(np.flatnonzero(sizes == sizes[sizes > 1].min())[0])
+        tried: List[int] = []
+        for v in np.flatnonzero(colors == cell):
+            if any(_twins(grid, u, v) for u in tried):
+                continue
+            tried.append(v)
+            individualized = colors * 2 + 1
+            individualized[v] -= 1
+            search(individualized)
+
+    if n:
+        search(np.zeros(n, dtype=np.int64) if colors is None else np.unique(colors, return_inverse=True)[1].ravel())
+    return best[1] if n else np.zeros(0, dtype=np.int64)
+
+
+def canonical_form(n: int, p: Iterable[Tuple[int, int]], q: Iterable[Tuple[int, int]] = ()) -> bytes:
+    """
+    A key that is equal for two (p, q) exactly when one is obtained from the other by renaming variables
+    """
+    grid = letter_grid(n, p, q)
+    order = canonical_order(grid)
+    return n.to_bytes(2, "little") + grid[np.ix_(order, order)].tobytes()
+
+
+def polynomial_grid(n: int, p: Iterable[Tuple[int, ...]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The incidence graph of a polynomial with monomials of any degree: the n variables followed by one vertex per
+    monomial, joined to its variables. Returns the grid and the colors, 0 for variables and 1 + degree for monomials.
+    """
+    p = list(p)
+    grid = np.zeros((n + len(p), n + len(p)), dtype=np.int8)
+    colors = np.zeros(n + len(p), dtype=np.int64)
+    for m, mon in enumerate(p):
+        colors[n + m] = 1 + len(mon)
+        for i in mon:
+            grid[i, n + m] = grid[n + m, i] = 1
+    return grid, colors
+
+
+def canonical_polynomial(n: int, p: Iterable[Tuple[int, ...]]) -> Tuple[bytes, np.ndarray]:
+    """
+    A key that is equal for two polynomials over n variables exactly when one is obtained from the other by renaming
+    variables, and the renaming into the canonical representative: relabel[v] is the new name of the variable v.
+    Quadratic forms are canonized as graphs on the variables, other polynomials through polynomial_grid.
+    """
+    p = [tuple(mon) for mon in p]
+    if all(len(mon) == 2 for mon in p):
+        grid, colors = letter_grid(n, p), np.zeros(n, dtype=np.int64)
+    else:
+        grid, colors = polynomial_grid(n, p)
+    order = canonical_order(grid, colors)
+    relabel = np.empty(n, dtype=np.int64)
+    relabel[order[:n]] = np.arange(n)
+    key = n.to_bytes(2, "little") + colors[order].astype(np.int8).tobytes() + grid[np.ix_(order, order)].tobytes()
+    return key, relabel
@@ -1,11 +1,22 @@
-#!/usr/bin/env sage
+#!/usr/bin/env python3
 
 import sys
-from sage.all import *
+import json
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from itertools import product
-from typing import Tuple, List, Set, Dict
-from collections import defaultdict
-from random import randint, seed
+from typing import Tuple, List, Set, Dict, Iterator, Optional
+from functools import lru_cache
+from math import comb
+from random import Random
+
+import numpy as np
+
+import gf2
+import instrument
+from polynomial import MAX_VARIABLES, Polynomial, multiply_many, multiply_tuples, num_variables
+from rank_cache import RankCache
 
 def multiply_monomials(mon1: Tuple[int, ...], mon2: Tuple[int, ...]) -> Tuple[int, ...]:
     """
@@ -14,90 +25,206 @@ def multiply_monomials(mon1: Tuple[int, ...], mon2: Tuple[int, ...]) -> Tuple[in
     return tuple(sorted(list(set(list(mon1) + list(mon2))))) 
 
 def multiply_polynomials(poly1: List[Tuple[int,...]],
-                         poly2: List[Tuple[int,...]]) -> List[Tuple[int, ...]]:
+                         poly2: List[Tuple[int,...]], method: str = "auto") -> List[Tuple[int, ...]]:
+    """
+    Multiplies two polynomials over F_2, sparsely or through truth tables, see polynomial.multiply_tuples
+    """
+    return multiply_tuples(poly1, poly2, method)
+
+
+def multiply_polynomials_many(p: List[Tuple[int, ...]], qs: List[List[Tuple[int, ...]]],
+                              method: str = "auto") -> List[List[Tuple[int, ...]]]:
     """
-    Multiplies two polynomials over F_2
+    Multiplies p by every q in qs, converting p and, on the truth table path, its truth table only once
     """
-    result = []
-    for a,b in product(poly1, poly2):
-        result.append(multiply_monomials(a, b))
-    result.sort()
-    final = []
-    for x in result:
-        if not final or final[-1] != x:
-            final.append(x)
-        elif final[-1] == x:
-            final = final[:-1]
-    return final
+    products = multiply_many(Polynomial.from_tuples(p), [Polynomial.from_tuples(q) for q in qs], method)
+    return [product.to_tuples() for product in products]
+
+
+Q_DEGREE = 3 # degree bound of q, the columns of A
+PRODUCT_DEGREE = 6 # degree bound of p*q, the rows of A
 
 
+@lru_cache(maxsize=None)
 def num_of_monomials_deg_atmost(n:int, d: int) -> int:
     """
     Calculates the number of monomials over n variables with degree at most d
     """
     num = 0
     for i in range(d + 1):
-        num += binomial(n, i)
+        num += comb(n, i)
     return num # without x_i^2=x_i it would have been: (n^(d+1)-1)//(n-1) #sum of 1 + n + n^2 + ... + n^d
 
 
-# def monomial_to_position(mon: Tuple[int, ...]) -> int:
-#     """
-#     Calculates the index (for either row or column) corresponding to the input monomial
-#     """
-#     deg = len(mon)
-#     if deg == 0:
-#         return 0
-#     num_of_smaller_deg = num_of_monomials_deg_atmost(deg - 1)
-#     mon.sort()
-#     num_of_smaller_vars = 0
-#     for i in range(deg):
-#         num_of_smaller_vars += binomial(mon[i] - 1, deg - i) # add the number of monomials that agree with mon up to the (i-1)'th variable, but have a smaller i'th variable
-#     return  num_of_smaller_deg + num_of_smaller_vars
-
-
-# def position_to_monimial(i: int) -> tuple:
-#     """
-#     Converts the index (for either row or column) i into the monomial represented by this position
-#     """
-#     same_deg_first_i = 0
-#     deg = 0
-#     next_deg_first_i = 1
-#     while next_deg_first_i < i:
-#         same_deg_first_i = next_deg_first_i
-#         deg += 1
-#         next_deg_first_i = num_of_monomials_deg_atmost(deg - 1)
-#     #not finished
-#     return #TODO
-
-mon_to_i: Dict[Tuple[int, ...], int]
-i_to_mon: Dict[int, Tuple[int, ...]]
-
-
-def create_multiplying_matrix(n: int, eq_map: Dict[tuple, List[tuple]]):
-    """
-    Creates the matrix A that maps a vector representing a polynomial p to the vector representing the product pq, given the eq_map which lists, for each monomial r in p, the monomials l*r for the all possible monomials l. 
-    """
-    matrix_dict = {}
-    prj_4_dict = {}
-    for i, mon in i_to_mon.items():
-        prj_4_dict[(i,i)] = 1 if len(mon) >= 4 else 0
-    for mon, eq in eq_map.items():
-        i = mon_to_i[mon]
-        for term in eq:
-            if term[0]=='q':
-                assert (len(term[1]) <= 3)
-                matrix_dict[(i, mon_to_i[term[1]])] = 1
-        
-    return matrix(GF(2), len(mon_to_i), num_of_monomials_deg_atmost(n, 3), matrix_dict),\
-           matrix(GF(2), len(mon_to_i), len(mon_to_i), prj_4_dict)
-
-
-monomials_list: List[Tuple[int, ...]] #monomials of degree at most 3
-
-
-def populate_monomials_list(n: int):
-    global monomials_list
+def monomial_to_position(mon: Tuple[int, ...], max_deg: int) -> int:
+    """
+    Calculates the index (for either row or column) corresponding to the input monomial of degree at most max_deg.
+    Monomials are ordered colexicographically (by the largest variable first), so the monomials over n variables
+    are exactly the positions below num_of_monomials_deg_atmost(n, max_deg), for every n
+    """
+    position = 0
+    for i, var in enumerate(sorted(mon, reverse=True)):
+        # skip all monomials that agree with mon above var, but have only smaller variables below it
+        position += num_of_monomials_deg_atmost(var, max_deg - i)
+    return position
+
+
+def position_to_monomial(position: int, max_deg: int) -> Tuple[int, ...]:
+    """
+    Converts the index (for either row or column) into the monomial of degree at most max_deg represented by this position
+    """
+    mon = []
+    deg = max_deg
+    while position > 0:
+        # the largest var with num_of_monomials_deg_atmost(var, deg) <= position
+        lo, hi = 0, 1
+        while num_of_monomials_deg_atmost(hi, deg) <= position:
+            lo, hi = hi, 2 * hi
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if num_of_monomials_deg_atmost(mid, deg) <= position:
+                lo = mid
+            else:
+                hi = mid
+        position -= num_of_monomials_deg_atmost(lo, deg)
+        mon.append(lo)
+        deg -= 1
+    return tuple(reversed(mon))
+
+
+@lru_cache(maxsize=None)
+def _num_monomials_table(max_deg: int) -> np.ndarray:
+    """
+    table[var, d] = num_of_monomials_deg_atmost(var, d) for all variables of a 64-bit mask
+    """
+    return np.array([[num_of_monomials_deg_atmost(var, d) for d in range(max_deg + 1)] for var in range(MAX_VARIABLES + 1)],
+                    dtype=np.int64)
+
+
+def monomial_positions(masks: np.ndarray, max_deg: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    monomial_to_position of every mask of the uint64 array masks, together with the degrees of the monomials.
+    Walks the variables from the largest one down, as monomial_to_position does, with one array operation per variable.
+    """
+    table = _num_monomials_table(max_deg)
+    positions = np.zeros(len(masks), dtype=np.int64)
+    degrees = np.zeros(len(masks), dtype=np.int64)
+    top = int(masks.max()).bit_length() if len(masks) else 0
+    for var in range(top - 1, -1, -1):
+        bit = ((masks >> np.uint64(var)) & np.uint64(1)).astype(np.int64)
+        positions += bit * table[var, np.maximum(max_deg - degrees, 0)]
+        degrees += bit
+    if len(masks) and degrees.max() > max_deg:
+        raise ValueError("a monomial has degree above " + str(max_deg))
+    return positions, degrees
+
+
+def monomial_masks(n: int, max_deg: int) -> np.ndarray:
+    """
+    The masks of all monomials over n variables of degree at most max_deg, ordered by position.
+    The monomials over x_0..x_v are those over x_0..x_{v-1} followed by x_v times the ones of one degree less.
+    """
+    by_degree = [np.zeros(1, dtype=np.uint64) for _ in range(max_deg + 1)]
+    for var in range(n):
+        bit = np.uint64(1 << var)
+        for d in range(max_deg, 0, -1):
+            by_degree[d] = np.concatenate((by_degree[d], by_degree[d - 1] | bit))
+    return by_degree[max_deg]
+
+
+def create_multiplying_matrix(n: int, A_high: Tuple[np.ndarray, np.ndarray], A_low: Tuple[np.ndarray, np.ndarray],
+                              backend: str = "gf2"):
+    """
+    Creates the matrix A that maps a vector representing a polynomial q to the vector representing the product pq, given as CSR
+    arrays (indptr, indices) split into A_high (the rows of the monomials of degree at least 4) and A_low (the other rows).
+    With the gf2 backend both stay sparse as CSR arrays, see gf2.py.
+    """
+    if backend not in gf2.BACKENDS:
+        raise ValueError("unknown backend " + backend)
+    if backend == "sage":
+        ncols = num_of_monomials_deg_atmost(n, Q_DEGREE)
+        matrices = []
+        for indptr, indices in (A_high, A_low):
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            matrices.append(gf2.sage_matrix(len(indptr) - 1, ncols, {(i, j): 1 for i, j in zip(rows.tolist(), indices.tolist())},
+                                            sparse=True))
+        return tuple(matrices)
+    return A_high, A_low
+
+
+class MultiplyingMatrixBuilder:
+    """
+    Builds the rows of A for a fixed p while the number of variables grows.
+    The monomials containing x_{n-1} come after all monomials over x_0..x_{n-2} in the position order, so going from n-1 to n
+    only appends the columns of the new monomials b and the rows of the new products p*b; the rows for smaller n are kept.
+    This needs p to be a polynomial over the variables already there: if p contains x_v with v >= n, the products of the old
+    columns with these terms share rows with the new products, so growing past v rebuilds A from the start.
+    Rows are the product monomials that occur, ordered by position within every step, kept as CSR arrays (indptr, indices)
+    separately for degree >= 4 and <= 3.
+    """
+
+    def __init__(self, p: List[Tuple[int, ...]]):
+        self.p = Polynomial.from_tuples(p)
+        self.n = 0
+        self._reset()
+
+    def _reset(self):
+        self.ncols = 0
+        self.high = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self.low = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    @property
+    def rows_high(self) -> int:
+        return len(self.high[0]) - 1
+
+    @property
+    def rows_low(self) -> int:
+        return len(self.low[0]) - 1
+
+    def grow(self, n: int):
+        """
+        Adds the rows and columns of A for the monomials over n variables that are not there yet.
+        All products b * m of a new column b and a term m of p are formed at once as the ORs of their masks; the entry
+        (row of b * m, column of b) is kept when it occurs an odd number of times, found by sorting the codes row * ncols + column.
+        """
+        if n < self.n:
+            raise ValueError("cannot shrink from n=" + str(self.n) + " to n=" + str(n))
+        if num_variables(self.p.terms) > self.n:
+            self._reset()
+        ncols = num_of_monomials_deg_atmost(n, Q_DEGREE)
+        masks = monomial_masks(n, Q_DEGREE)[self.ncols:]
+        products = (masks[:, None] | self.p.terms[None, :]).ravel()
+        positions, degrees = monomial_positions(products, PRODUCT_DEGREE)
+        codes = positions * ncols + np.repeat(np.arange(self.ncols, ncols, dtype=np.int64), len(self.p.terms))
+        codes, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        odd = counts & 1 == 1
+        codes, degrees = codes[odd], degrees[first[odd]]
+        rows, columns = np.divmod(codes, ncols)
+        self.high = self._append(self.high, rows[degrees >= 4], columns[degrees >= 4])
+        self.low = self._append(self.low, rows[degrees < 4], columns[degrees < 4])
+        self.n = n
+        self.ncols = ncols
+
+    @staticmethod
+    def _append(csr: Tuple[np.ndarray, np.ndarray], rows: np.ndarray, columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Appends one CSR row per distinct value of the sorted array rows
+        """
+        indptr, indices = csr
+        if len(rows) == 0:
+            return csr
+        starts = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1])))
+        return np.concatenate((indptr, indptr[-1] + np.append(starts[1:], len(rows)))), np.concatenate((indices, columns))
+
+    def matrices(self, backend: str = "gf2"):
+        return create_multiplying_matrix(self.n, self.high, self.low, backend)
+
+
+def populate_monomials_list(n: int) -> List[Tuple[int, ...]]:
+    """
+    Lists the monomials of degree at most 3: cubic, quadratic, linear and then the constant one.
+    The random choice of p in search_for_quad_growth depends on this order
+    """
     monomials_list = []
     for b in product(range(n), repeat=3): # cubic monomials
         if b[0] >= b[1] or b[1] >= b[2]:
@@ -110,85 +237,248 @@ def populate_monomials_list(n: int):
     for b in range(n): # linear monomials
         monomials_list.append(tuple([b]))
     monomials_list.append(()) # the constant monomial
-    global mon_to_i
-    mon_to_i = dict(zip(monomials_list, range(len(monomials_list))))
-    global i_to_mon
-    i_to_mon = dict(zip(range(len(monomials_list)), monomials_list)) #TODO: add the above-deg-3 monomials (or leavet hem being populated in generate_equations?)
-
-
-def generate_equations(n: int, p: List[Tuple[int, ...]]) -> Tuple[List[List[Tuple[int, ...]]], List[Tuple[str, Tuple[int, ...]]]]:
-    eq_map = defaultdict(list)
-    populate_monomials_list(n)
-    # for a in p:        
-    for b in monomials_list:
-        result = multiply_polynomials(p, [b])
-        for mon in result:
-            eq_map[mon].append(('q', b))
-    for a in eq_map.keys():
-        if a not in mon_to_i:
-            new_i = len(mon_to_i)
-            mon_to_i[a] = new_i
-            i_to_mon[new_i] = a
-        if len(a) <= 3:
-            eq_map[a].append(('pq', a))
-    A, prj = create_multiplying_matrix(n, eq_map)
-  #  print(A)
-   # print(prj)
-    # print("A: rows="+str(A.nrows())+" cols="+str(A.ncols()))
-    # print("prj: rows="+str(prj.nrows())+" cols="+str(prj.ncols()))
-    return A, prj
-
-
-def calculate_dim_of_prod(n: int, A, prj) -> int:
-    return (A * matrix((prj * A).transpose().kernel().basis()).transpose()).rank()
-
-def calculate_dim_of_qs(n: int, A, prj) -> int:
-    return matrix((prj * A).transpose().kernel().basis()).rank()
-
-def search_for_quad_growth(min_n:int, max_n: int, first_seed:int, threshold:int):
-    for cur_seed in range(first_seed, first_seed+100):
-        seed(cur_seed)
-        populate_monomials_list(min_n)
-        with_constant = False #a flag deciding whether a constant is part of p or not
-        p = [i_to_mon[i] for i in range(num_of_monomials_deg_atmost(min_n, 3)) if randint(0, 100)<5 and (i_to_mon[i] is not ())] #without the constant 
-        if len(p) == 0 or max(len(t) for t in p) < 2:
+    return monomials_list
+
+
+def generate_equations(n: int, p: List[Tuple[int, ...]], backend: str = "gf2") -> tuple:
+    builder = MultiplyingMatrixBuilder(p)
+    builder.grow(n)
+    return builder.matrices(backend)
+
+
+def calculate_dims(n: int, A_high, A_low, backend: str = "gf2", certify: bool = False) -> Tuple[int, int, List[Tuple[int, ...]]]:
+    """
+    Computes the dimension of the space of q with deg(pq) <= 3 (the kernel of A_high), the dimension of the space of their
+    products pq, and a witness q from the kernel, with pq != 0 whenever there is one. The kernel is computed once:
+    dim(pq) = rank(A) - rank(A_high), since A_high vanishes on the kernel.
+    The wiedemann backend takes both ranks and the witness from gf2.BlockWiedemann runs on A_high and A, which only
+    multiply them by blocks of vectors; certify repeats them until two independent runs agree on the ranks.
+    """
+    ncols = num_of_monomials_deg_atmost(n, Q_DEGREE)
+    if backend == "sage":
+        with instrument.phase("calculate_dims/kernel", n=n, rows=A_high.nrows(), cols=ncols) as record:
+            kernel = A_high.right_kernel()
+            record.set(dim=kernel.dimension())
+        with instrument.phase("calculate_dims/rank", n=n, rows=A_high.nrows() + A_low.nrows(), cols=ncols) as record:
+            dim_of_prod = A_high.stack(A_low).rank() - A_high.rank()
+            record.set(dim_of_prod=dim_of_prod)
+        with instrument.phase("calculate_dims/witness", n=n):
+            vectors = kernel.basis()
+            witness = next((v for v in vectors if A_low * v != 0), vectors[0] if vectors else None)
+        support = [] if witness is None else [j for j in range(ncols) if witness[j] == 1]
+        return kernel.dimension(), dim_of_prod, [position_to_monomial(j, Q_DEGREE) for j in support]
+
+    if backend == "wiedemann":
+        A = np.concatenate((A_high[0], A_high[0][-1] + A_low[0][1:])), np.concatenate((A_high[1], A_low[1]))
+
+        def run(seed: int):
+            with instrument.phase("calculate_dims/wiedemann", n=n, rows=len(A[0]) - 1, cols=ncols, nnz=len(A[1])) as record:
+                rng = np.random.default_rng(seed)
+                high = gf2.BlockWiedemann(*A_high, ncols, seed=rng)
+                full = gf2.BlockWiedemann(*A, ncols, seed=rng)
+                record.set(rank_high=high.rank, rank=full.rank, matvecs=high.matvecs + full.matvecs)
+            return high, full.rank
+        high, rank = gf2.certified(run, certify, key=lambda result: (result[0].rank, result[1]))
+        dim_of_prod = rank - high.rank
+        with instrument.phase("calculate_dims/witness", n=n) as record:
+            kernel = high.kernel_vectors()
+            record.set(vectors=len(kernel))
+            witness = kernel[0] if len(kernel) else None
+            if len(kernel) and dim_of_prod > 0:
+                # the kernel vectors q with A_low q != 0
+                images = np.bitwise_or.reduce(gf2.multiply_csr(*A_low, gf2.transpose(kernel, ncols)), axis=0)
+                hits = np.flatnonzero(gf2.unpack_bits(images[None], len(kernel))[0])
+                if len(hits) == 0:
+                    raise RuntimeError("none of the " + str(len(kernel)) + " kernel vectors has pq != 0")
+                witness = kernel[hits[0]]
+        support = [] if witness is None else gf2.unpack_row(witness)
+        return ncols - high.rank, dim_of_prod, [position_to_monomial(j, Q_DEGREE) for j in support]
+
+    with instrument.phase("calculate_dims/kernel", n=n, rows=len(A_high[0]) - 1, cols=ncols, nnz=len(A_high[1])) as record:
+        basis = gf2.EchelonBasis(ncols)
+        for chunk in gf2.iter_csr_chunks(*A_high, ncols):
+            basis.add_rows(chunk)
+        record.set(dim=ncols - basis.rank)
+    with instrument.phase("calculate_dims/rank", n=n, rows=len(A_low[0]) - 1, cols=ncols, nnz=len(A_low[1])) as record:
+        low = gf2.pack_csr(*A_low, ncols)
+        full = basis.copy()
+        full.add_rows(low)
+        dim_of_prod = full.rank - basis.rank
+        record.set(dim_of_prod=dim_of_prod)
+    with instrument.phase("calculate_dims/witness", n=n) as record:
+        witness = None
+        for free_col in basis.free_columns():
+            vector = basis.kernel_vector(free_col)
+            record.add("tried", 1)
+            if witness is None:
+                witness = vector
+            if dim_of_prod == 0:
+                break
+            if gf2.parity(low & vector).any():
+                witness = vector
+                break
+    support = [] if witness is None else gf2.unpack_row(witness)
+    return ncols - basis.rank, dim_of_prod, [position_to_monomial(j, Q_DEGREE) for j in support]
+
+
+def candidate_p(cur_seed: int, min_n: int) -> Optional[List[Tuple[int, ...]]]:
+    """
+    Draws the random p of a seed from the monomials over min_n variables, or None if the seed gives no p of degree at least 2
+    """
+    rng = Random(cur_seed)
+    with_constant = False #a flag deciding whether a constant is part of p or not
+    p = [mon for mon in populate_monomials_list(min_n) if rng.randint(0, 100)<5 and mon != ()] #without the constant
+    if len(p) == 0 or max(len(t) for t in p) < 2:
+        return None
+    if with_constant:
+        p.append(())
+    return p
+
+
+def sweep_seed(cur_seed: int, min_n: int, max_n: int, threshold: int, backend: str = "gf2", stop_event=None,
+               cache=None) -> dict:
+    """
+    Follows dim_of_prod of the candidate p of one seed for n from min_n to max_n, until its increments
+    grew more than threshold times in a row. Returns the record of the seed:
+    {"seed", "p", "dims": [{"n", "dim_of_prod", "dim_of_qs"}, ...], "hit", "q", "interrupted"}
+    With a rank_cache.RankCache, the dims and witness of p, or of any p isomorphic to it, are looked up before A is built.
+    """
+    record = {"seed": cur_seed, "p": candidate_p(cur_seed, min_n), "dims": [], "hit": False, "q": None, "interrupted": False}
+    if record["p"] is None:
+        return record
+    instrument.event("sweep_seed/candidate", seed=cur_seed, p=record["p"])
+    diff = -1
+    prev_diff = -1
+    prev_dim_of_prod = -1
+    dim_of_prod = -1
+    diff_grows = 0
+    builder = MultiplyingMatrixBuilder(record["p"])
+    for n in range(min_n, max_n + 1):#11,40):
+        # p = [(0, 1, 2), (4, 5, 6), (1, 2), (4,5), (6, 7)]#[(0, 1),(1,2),(2,3),(1,3)] with n=4 showed the bug (the code was using monomials multiplication, rather than polynomials multiplication, to create A)
+        # p = [(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3), (0, 1), (0, 3), (1, 3), (2, 3), (3,), ()] looks like a counterexample (seed=16)
+        if stop_event is not None and stop_event.is_set():
+            record["interrupted"] = True
+            return record
+        prev_dim_of_prod = dim_of_prod
+        hit = None if cache is None else cache.get("dims", n, record["p"])
+        if hit is not None:
+            (dim_of_qs, dim_of_prod), q = hit
+        else:
+            with instrument.phase("sweep_seed/equations", seed=cur_seed, n=n) as phase:
+                builder.grow(n)
+                phase.set(rows_high=builder.rows_high, rows_low=builder.rows_low, cols=builder.ncols)
+            with instrument.phase("sweep_seed/matrix", seed=cur_seed, n=n, backend=backend):
+                A_high, A_low = builder.matrices(backend)
+            dim_of_qs, dim_of_prod, q = calculate_dims(n, A_high, A_low, backend)
+            if cache is not None:
+                cache.put("dims", n, record["p"], [dim_of_qs, dim_of_prod], q)
+        instrument.event("sweep_seed/dims", seed=cur_seed, n=n, dim_of_prod=dim_of_prod, dim_of_qs=dim_of_qs,
+                         cached=hit is not None)
+        record["dims"].append({"n": n, "dim_of_prod": dim_of_prod, "dim_of_qs": dim_of_qs})
+        if prev_dim_of_prod > 0:
+            prev_diff = diff
+            diff = dim_of_prod - prev_dim_of_prod
+            if prev_diff > 0:
+                if diff > prev_diff:
+                    diff_grows += 1
+                else:
+                    diff_grows = 0
+        if diff_grows > threshold:
+            record["hit"] = True
+            record["q"] = q
+            return record
+    return record
+
+
+def search_for_quad_growth(min_n:int, max_n: int, first_seed:int, threshold:int, backend: str = "gf2", num_seeds: int = 100,
+                           cache=None):
+    for cur_seed in range(first_seed, first_seed+num_seeds):
+        record = sweep_seed(cur_seed, min_n, max_n, threshold, backend, cache=cache)
+        p = record["p"]
+        if p is None:
             continue
-        if with_constant:
-            p.append(())
-        print('Candidate p=', p)
-        diff = -1
-        prev_diff = -1
-        prev_dim_of_prod = -1
-        dim_of_prod = -1
-        diff_grows = 0
-        for n in range(min_n, max_n + 1):#11,40):
-            # p = [(0, 1, 2), (4, 5, 6), (1, 2), (4,5), (6, 7)]#[(0, 1),(1,2),(2,3),(1,3)] with n=4 showed the bug (the code was using monomials multiplication, rather than polynomials multiplication, to create A)
-            # p = [(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3), (0, 1), (0, 3), (1, 3), (2, 3), (3,), ()] looks like a counterexample (seed=16)
-            print('current n=',n, ' and previous dim_of_prod=', dim_of_prod)
-            A, prj = generate_equations(n, p)
-            prev_dim_of_prod = dim_of_prod
-            dim_of_prod = calculate_dim_of_prod(n, A, prj)
-            if prev_dim_of_prod > 0:
-                prev_diff = diff
-                diff = dim_of_prod - prev_dim_of_prod
-                if prev_diff > 0:
-                    if diff > prev_diff:
-                        diff_grows += 1
-                    else:
-                        diff_grows = 0
-            if diff_grows > threshold:
-                print('n=', n, 'rank of prod=', dim_of_prod, "  rank of qs=", calculate_dim_of_qs(n, A, prj))
-                print('p=', p)
-                vec = matrix((prj * A).transpose().kernel().basis())[0]
-                q = []
-                for j in range(len(vec)):
-                    if vec[j]==1:
-                        q.append(i_to_mon[j])
-                
-                print('q in kernel=', q, multiply_polynomials(p, q))
-                return
-
-search_for_quad_growth(5, 20, 1916, 5)
+        if record["hit"]:
+            dims = record["dims"][-1]
+            print('n=', dims["n"], 'rank of prod=', dims["dim_of_prod"], "  rank of qs=", dims["dim_of_qs"])
+            print('p=', p)
+            print('q in kernel=', record["q"], multiply_polynomials(p, record["q"]))
+            return
+
+
+_stop_event = None
+
+
+def _init_sweep_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _sweep_seed_in_worker(cur_seed: int, min_n: int, max_n: int, threshold: int, backend: str, cache) -> dict:
+    return sweep_seed(cur_seed, min_n, max_n, threshold, backend, _stop_event, cache)
+
+
+def read_checkpoint(path: str) -> List[dict]:
+    """
+    Reads the records of the finished seeds, one JSON object per line
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parallel_search_for_quad_growth(min_n: int, max_n: int, first_seed: int, threshold: int, num_seeds: int = 1000,
+                                    checkpoint: Optional[str] = None, processes: Optional[int] = None,
+                                    backend: str = "gf2", cache=None) -> Iterator[dict]:
+    """
+    Runs sweep_seed for the seeds first_seed..first_seed+num_seeds-1 on a process pool and yields their records as they finish.
+    Every finished record is appended to the checkpoint file, and seeds already recorded there are skipped, so a killed run resumes
+    where it stopped. The first hit stops the sweep: pending seeds are cancelled and running ones give up before their next n.
+    """
+    done = read_checkpoint(checkpoint) if checkpoint else []
+    if any(record["hit"] for record in done):
+        return
+    finished = {record["seed"] for record in done}
+    seeds = iter([s for s in range(first_seed, first_seed + num_seeds) if s not in finished])
+    processes = processes or os.cpu_count()
+    context = multiprocessing.get_context()
+    stop_event = context.Event()
+    out = open(checkpoint, "a") if checkpoint else None
+    try:
+        with ProcessPoolExecutor(processes, mp_context=context, initializer=_init_sweep_worker, initargs=(stop_event,)) as executor:
+            pending = set()
+            try:
+                while True:
+                    # keep a bounded window of submitted seeds, so a hit has little to cancel
+                    for cur_seed in seeds:
+                        pending.add(executor.submit(_sweep_seed_in_worker, cur_seed, min_n, max_n, threshold, backend, cache))
+                        if len(pending) >= 2 * processes:
+                            break
+                    if not pending:
+                        break
+                    completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        record = future.result()
+                        if record["interrupted"]:
+                            continue
+                        if out:
+                            out.write(json.dumps(record) + "\n")
+                            out.flush()
+                        yield record
+                        if record["hit"]:
+                            return
+            finally:
+                # after a hit, an error or the caller closing the generator nothing else is needed
+                stop_event.set()
+                for future in pending:
+                    future.cancel()
+    finally:
+        if out:
+            out.close()
+
+
+if __name__ == "__main__":
+    search_for_quad_growth(5, 20, 1916, 5, cache=RankCache())
 # seed(25) #16 looks like a counterexample
 # min_n = 4
 # max_n = 40
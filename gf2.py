@@ -0,0 +1,481 @@
+"""
+Linear algebra over GF(2) on bit-packed rows.
+
+A matrix with ncols columns is a 2-d uint64 array with one row per matrix row and
+ceil(ncols / 64) words per row; column j is bit j % 64 of word j // 64.
+Elimination XORs whole rows at once, so no Sage is needed for rank and kernel.
+BlockWiedemann finds the rank of a large sparse matrix from products with blocks of vectors alone.
+"""
+
+from typing import Callable, List, Tuple, TypeVar
+
+import numpy as np
+
+WORD_BITS = 64
+BACKENDS = ("gf2", "sage", "wiedemann")
+
+T = TypeVar("T")
+
+
+def sage_matrix(nrows: int, ncols: int, entries: dict, **kwargs):
+    """
+    The Sage matrix over GF(2) with ones at the keys (i, j) of entries, for the sage backend.
+    Sage is only imported here, so importing the modules or using the gf2 backend never loads it.
+    """
+    try:
+        from sage.all import matrix, GF
+    except ImportError as e:
+        raise ImportError('the sage backend needs Sage, run under sage or use backend="gf2"') from e
+    return matrix(GF(2), nrows, ncols, entries, **kwargs)
+
+
+def num_words(ncols: int) -> int:
+    return (ncols + WORD_BITS - 1) // WORD_BITS
+
+
+def zeros(nrows: int, ncols: int) -> np.ndarray:
+    return np.zeros((nrows, num_words(ncols)), dtype=np.uint64)
+
+
+def pack_coo(nrows: int, ncols: int, row_ids: np.ndarray, col_ids: np.ndarray) -> np.ndarray:
+    """
+    Packs the matrix with ones at (row_ids[k], col_ids[k]); repeated coordinates are set once
+    """
+    rows = zeros(nrows, ncols)
+    col_ids = np.asarray(col_ids, dtype=np.int64)
+    bits = np.left_shift(np.uint64(1), (col_ids % WORD_BITS).astype(np.uint64))
+    np.bitwise_or.at(rows, (np.asarray(row_ids, dtype=np.int64), col_ids // WORD_BITS), bits)
+    return rows
+
+
+def pack_csr(indptr: np.ndarray, indices: np.ndarray, ncols: int, start: int = 0, stop: int = None) -> np.ndarray:
+    """
+    Packs the rows start..stop-1 of a CSR matrix
+    """
+    stop = len(indptr) - 1 if stop is None else stop
+    lengths = np.diff(indptr[start:stop + 1])
+    row_ids = np.repeat(np.arange(stop - start), lengths)
+    return pack_coo(stop - start, ncols, row_ids, indices[indptr[start]:indptr[stop]])
+
+
+def iter_csr_chunks(indptr: np.ndarray, indices: np.ndarray, ncols: int, chunk_rows: int = 4096):
+    """
+    Yields the rows of a CSR matrix packed in chunks of chunk_rows, so a tall sparse matrix is never packed whole
+    """
+    for start in range(0, len(indptr) - 1, chunk_rows):
+        yield pack_csr(indptr, indices, ncols, start, min(start + chunk_rows, len(indptr) - 1))
+
+
+def unpack_bits(rows: np.ndarray, ncols: int) -> np.ndarray:
+    """
+    Converts packed rows into a 0/1 uint8 array with ncols columns
+    """
+    as_bytes = np.ascontiguousarray(rows, dtype="<u8").view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, bitorder="little")[:, :ncols]
+
+
+def pack_bits(bits: np.ndarray) -> np.ndarray:
+    """
+    Converts a 0/1 array into packed rows, the inverse of unpack_bits
+    """
+    nrows, ncols = bits.shape
+    padded = np.zeros((nrows, num_words(ncols) * WORD_BITS), dtype=np.uint8)
+    padded[:, :ncols] = bits
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8").astype(np.uint64)
+
+
+def unpack_row(row: np.ndarray) -> List[int]:
+    """
+    Lists the columns where a packed row has a one
+    """
+    return np.flatnonzero(unpack_bits(row.reshape(1, -1), len(row) * WORD_BITS)[0]).tolist()
+
+
+def parity(rows: np.ndarray) -> np.ndarray:
+    """
+    Parity of the number of ones in every packed row
+    """
+    x = np.bitwise_xor.reduce(rows, axis=-1)
+    for shift in (32, 16, 8, 4, 2, 1):
+        x ^= x >> np.uint64(shift)
+    return (x & np.uint64(1)).astype(bool)
+
+
+def transpose(rows: np.ndarray, ncols: int) -> np.ndarray:
+    return pack_bits(unpack_bits(rows, ncols).T)
+
+
+def multiply(a: np.ndarray, a_ncols: int, b: np.ndarray) -> np.ndarray:
+    """
+    Multiplies a (with a_ncols columns) by b (with a_ncols rows): every row of the product
+    is the XOR of the rows of b selected by the ones of the corresponding row of a
+    """
+    product = np.zeros((len(a), b.shape[1]), dtype=np.uint64)
+    for k in range(a_ncols):
+        selected = np.flatnonzero(a[:, k // WORD_BITS] & np.uint64(1 << (k % WORD_BITS)))
+        if len(selected):
+            product[selected] ^= b[k]
+    return product
+
+
+def echelon_form(rows: np.ndarray, ncols: int, reduced: bool = False) -> Tuple[np.ndarray, List[int]]:
+    """
+    Gaussian elimination by XOR of rows, returns the nonzero echelon rows and their pivot columns.
+    The pivot of each row is its lowest column; with reduced=True the pivot columns are also
+    cleared in the rows above, giving the reduced row echelon form.
+    """
+    m = np.array(rows, dtype=np.uint64, copy=True)
+    pivots = []
+    r = 0
+    for w in range(num_words(ncols)):
+        while r < len(m):
+            # the lowest column of this word where a remaining row has a one is the next pivot
+            present = int(np.bitwise_or.reduce(m[r:, w]))
+            if not present:
+                break
+            low = present & -present
+            bit = np.uint64(low)
+            hits = np.flatnonzero(m[r:, w] & bit)
+            p = r + hits[0]
+            if p != r:
+                m[[r, p]] = m[[p, r]]
+            # the rows at or below r are zero before this column, so only words from w on change
+            pivot_row = m[r, w:]
+            below = r + hits[1:]
+            if len(below):
+                m[below, w:] ^= pivot_row
+            if reduced:
+                above = np.flatnonzero(m[:r, w] & bit)
+                if len(above):
+                    m[above, w:] ^= pivot_row
+            pivots.append(w * WORD_BITS + low.bit_length() - 1)
+            r += 1
+            if r % WORD_BITS == 0:
+                # drop the rows that became zero so later columns scan less
+                nonzero = r + np.flatnonzero(m[r:].any(axis=1))
+                m = np.concatenate((m[:r], m[nonzero]))
+    return m[:r], pivots
+
+
+def rank(rows: np.ndarray, ncols: int) -> int:
+    return len(echelon_form(rows, ncols)[1])
+
+
+def kernel_basis(rows: np.ndarray, ncols: int) -> np.ndarray:
+    """
+    Returns packed vectors v forming a basis of {v : rows * v = 0}, one for every non-pivot column
+    """
+    echelon, pivots = echelon_form(rows, ncols, reduced=True)
+    free = np.setdiff1d(np.arange(ncols), pivots)
+    basis = np.zeros((len(free), ncols), dtype=np.uint8)
+    basis[np.arange(len(free)), free] = 1
+    if pivots:
+        basis[:, pivots] = unpack_bits(echelon, ncols)[:, free].T
+    return pack_bits(basis)
+
+
+class EchelonBasis:
+    """
+    Row echelon basis of all rows added so far, sorted by pivot column.
+    New rows are first reduced against the basis and only their remainders are eliminated,
+    so the rank of a matrix can be maintained while its rows arrive in chunks.
+    """
+
+    def __init__(self, ncols: int):
+        self.ncols = ncols
+        self.rows = zeros(0, ncols)
+        self.pivots = np.zeros(0, dtype=np.int64)
+
+    @property
+    def rank(self) -> int:
+        return len(self.pivots)
+
+    def copy(self) -> "EchelonBasis":
+        other = EchelonBasis(self.ncols)
+        other.rows = self.rows.copy()
+        other.pivots = self.pivots.copy()
+        return other
+
+    def reduce(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Returns the rows with every pivot column of the basis cleared
+        """
+        rows = np.array(rows, dtype=np.uint64, copy=True)
+        for basis_row, col in zip(self.rows, self.pivots):
+            w = col // WORD_BITS
+            hits = np.flatnonzero(rows[:, w] & np.uint64(1 << (col % WORD_BITS)))
+            if len(hits):
+                rows[hits, w:] ^= basis_row[w:]
+        return rows
+
+    def add_rows(self, rows: np.ndarray) -> int:
+        """
+        Adds the rows to the spanned space, returns by how much the rank grew
+        """
+        remainder = self.reduce(rows)
+        new_rows, new_pivots = echelon_form(remainder[remainder.any(axis=1)], self.ncols)
+        if new_pivots:
+            pivots = np.concatenate((self.pivots, new_pivots))
+            order = np.argsort(pivots, kind="stable")
+            self.rows = np.concatenate((self.rows, new_rows))[order]
+            self.pivots = pivots[order]
+        return len(new_pivots)
+
+    def free_columns(self) -> np.ndarray:
+        return np.setdiff1d(np.arange(self.ncols), self.pivots)
+
+    def kernel_vector(self, free_col: int) -> np.ndarray:
+        """
+        The packed vector x with x[free_col] = 1, zero at the other free columns, and rows * x = 0
+        for every row in the span, found by back substitution from the highest pivot
+        """
+        x = zeros(1, self.ncols)[0]
+        x[free_col // WORD_BITS] |= np.uint64(1 << (free_col % WORD_BITS))
+        for basis_row, col in zip(self.rows[::-1], self.pivots[::-1]):
+            if parity(basis_row & x):
+                x[col // WORD_BITS] |= np.uint64(1 << (col % WORD_BITS))
+        return x
+
+
+def multiply_csr(indptr: np.ndarray, indices: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Multiplies a sparse matrix given in CSR form by the packed matrix b:
+    every row of the product is the XOR of the rows of b at the indices of that row
+    """
+    product = np.zeros((len(indptr) - 1, b.shape[1]), dtype=np.uint64)
+    nonempty = np.flatnonzero(np.diff(indptr))
+    if len(nonempty) and b.shape[1] == 1:
+        # a single word per row, reduced as a flat array, which is much faster than along axis 0
+        product[nonempty, 0] = np.bitwise_xor.reduceat(b[:, 0][indices[:indptr[-1]]], indptr[nonempty])
+    elif len(nonempty):
+        product[nonempty] = np.bitwise_xor.reduceat(b[indices[:indptr[-1]]], indptr[nonempty], axis=0)
+    return product
+
+
+class KernelBasis:
+    """
+    Basis of the kernel {x : M x = 0} of all rows M added so far, kept as the packed ncols x dim matrix
+    whose columns are the basis vectors. A new chunk of rows is multiplied by this matrix and only the
+    kernel of that product is eliminated, which is cheap for tall sparse matrices of small nullity.
+    """
+
+    # bound on the words of the gathered rows in multiply_csr, the chunks are split to stay below it
+    MAX_GATHER_WORDS = 1 << 23
+
+    def __init__(self, ncols: int):
+        self.ncols = ncols
+        self.dim = ncols
+        self.coordinates = pack_bits(np.eye(ncols, dtype=np.uint8))
+
+    @property
+    def rank(self) -> int:
+        return self.ncols - self.dim
+
+    def add_columns(self, count: int):
+        """
+        Appends count columns that no row added so far involves, each of them a new direction of the kernel
+        """
+        coordinates = zeros(self.ncols + count, self.dim + count)
+        coordinates[:self.ncols, :self.coordinates.shape[1]] = self.coordinates
+        new_bits = self.dim + np.arange(count)
+        coordinates[self.ncols + np.arange(count), new_bits // WORD_BITS] = \
+            np.left_shift(np.uint64(1), (new_bits % WORD_BITS).astype(np.uint64))
+        self.coordinates = coordinates
+        self.ncols += count
+        self.dim += count
+
+    def add_csr(self, indptr: np.ndarray, indices: np.ndarray):
+        """
+        Restricts the kernel to the vectors that also vanish on the rows of a CSR chunk
+        """
+        start = 0
+        nrows = len(indptr) - 1
+        while start < nrows and self.dim > 0:
+            budget = self.MAX_GATHER_WORDS // max(1, num_words(self.dim))
+            stop = int(np.searchsorted(indptr, indptr[start] + budget, side="right")) - 1
+            stop = min(nrows, max(stop, start + 1))
+            chunk_indptr = indptr[start:stop + 1] - indptr[start]
+            chunk_indices = indices[indptr[start]:indptr[stop]]
+            self._restrict(multiply_csr(chunk_indptr, chunk_indices, self.coordinates))
+            start = stop
+
+    def _restrict(self, images: np.ndarray):
+        images = images[images.any(axis=1)]
+        if len(images) == 0:
+            return
+        combinations = kernel_basis(images, self.dim)
+        self.coordinates = multiply(self.coordinates, self.dim, transpose(combinations, self.dim))
+        self.dim = len(combinations)
+        if self.dim == 0:
+            self.coordinates = zeros(self.ncols, 0)
+
+
+def _bits_csr(bits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The CSR form (indptr, indices) of a 0/1 array
+    """
+    rows, cols = np.nonzero(bits)
+    indptr = np.zeros(len(bits) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(bits)), out=indptr[1:])
+    return indptr, cols.astype(np.int64)
+
+
+def _transpose_blocks(blocks: np.ndarray) -> np.ndarray:
+    """
+    Transposes every 64 x 64 matrix of a (count, 64) array, word a of a matrix being its row a
+    """
+    bits = unpack_bits(blocks.reshape(-1, 1), WORD_BITS).reshape(-1, WORD_BITS, WORD_BITS)
+    return pack_bits(bits.transpose(0, 2, 1).reshape(-1, WORD_BITS)).reshape(blocks.shape)
+
+
+def minimal_generator(sequence: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matrix Berlekamp-Massey for a sequence of 64 x 64 matrices S_0, ..., S_{L-1}, given as a (L, 64) array with
+    row a of S_i in sequence[i, a]. Finds 64 vector polynomials f_g(t) = sum_j f_{g,j} t^j of degrees d_g with
+    sum_j S_{i+j} f_{g,j} = 0 for all i + d_g < L, of least total degree, which is the rank of the block Hankel
+    matrix (S_{i+j}) once L exceeds twice the largest degree by a margin.
+    This is the iterative order basis (M-Basis) of [T(z); I] for T(z) = sum_i S_i^T z^i, over 128 rows [p | q]
+    with p T + q = 0 mod z^k after step k; each step eliminates the coefficient of z^k with the rows of least
+    degree as pivots and multiplies the pivots by z. The 64 rows of least degree hold the reversed f_g in p.
+    Returns the degrees and the (64, max degree + 1) coefficients, bit b of [g, j] being entry b of f_{g,j}.
+    """
+    length = len(sequence)
+    # row r: the coefficients of (p T + q)_r from z^0 on, then those of [p | q]_r as two words each
+    rows = np.zeros((2 * WORD_BITS, length + 2 * (length + 2)), dtype=np.uint64)
+    unit = np.left_shift(np.uint64(1), np.arange(WORD_BITS, dtype=np.uint64))
+    rows[:WORD_BITS, :length] = _transpose_blocks(sequence).T
+    rows[WORD_BITS + np.arange(WORD_BITS), 0] = unit
+    rows[np.arange(WORD_BITS), length] = unit
+    rows[WORD_BITS + np.arange(WORD_BITS), length + 1] = unit
+    # the degree of a row is max(deg p, deg q + 1)
+    degrees = np.repeat([0, 1], WORD_BITS)
+    for k in range(length):
+        # the residues in the order of the degrees, as Python ints, and for every bit the positions having it
+        order = np.lexsort((np.arange(2 * WORD_BITS), degrees))
+        residues = rows[order, k]
+        having = [a | b << WORD_BITS for a, b in zip(*pack_bits(unpack_bits(residues[:, None], WORD_BITS).T).T.tolist())]
+        residues = residues.tolist()
+        remaining = (1 << 2 * WORD_BITS) - 1
+        pivots = []
+        for bit in range(WORD_BITS):
+            candidates = having[bit] & remaining
+            if not candidates:
+                continue
+            # the first candidate has the least degree, the others are no lower and are reduced by it
+            pivot = (candidates & -candidates).bit_length() - 1
+            others = candidates ^ (1 << pivot)
+            remaining ^= 1 << pivot
+            pivots.append(pivot)
+            if not others:
+                continue
+            higher = residues[pivot] & -(2 << bit)
+            while higher:
+                low = higher & -higher
+                having[low.bit_length() - 1] ^= others
+                higher ^= low
+            positions = []
+            while others:
+                low = others & -others
+                positions.append(low.bit_length() - 1)
+                residues[positions[-1]] ^= residues[pivot]
+                others ^= low
+            stop = length + 2 * (int(degrees[order[pivot]]) + 1)
+            rows[order[positions], k:stop] ^= rows[order[pivot], k:stop]
+        pivots = order[pivots]
+        rows[pivots, k + 1:length] = rows[pivots, k:length - 1].copy()
+        rows[pivots, k] = 0
+        rows[pivots, length + 2:] = rows[pivots, length:-2].copy()
+        rows[pivots, length:length + 2] = 0
+        degrees[pivots] += 1
+    generators = np.argsort(degrees, kind="stable")[:WORD_BITS]
+    degrees = degrees[generators]
+    p = rows[generators, length::2]
+    # f_{g,j} is the coefficient of z^(d_g - j) in p_g
+    j = np.arange(degrees.max(initial=0) + 1)
+    reversed_index = degrees[:, None] - j
+    coefficients = np.where(reversed_index >= 0, p[np.arange(WORD_BITS)[:, None], np.maximum(reversed_index, 0)], 0)
+    return degrees, coefficients.astype(np.uint64)
+
+
+class BlockWiedemann:
+    """
+    Randomized rank and kernel vectors of a sparse nrows x ncols matrix A in CSR form, touching A only through
+    multiply_csr with blocks of 64 vectors, bit b of every word belonging to vector b, so memory stays O(nnz + ncols).
+    The rows of A are first hashed into B = R A with R summing every row into 3 random ones of ncols + 64 buckets,
+    a square matrix of the same rank unless R is degenerate on the column space of A; B is kept as the entries of A
+    listed bucket by bucket, so a product by B is a single multiply_csr. For random blocks X, Y the
+    sequence X^T B^i (B Y) of 64 x 64 matrices spans a block Hankel matrix of rank dim K(B Y) = rank(B), found as the
+    total degree of its minimal_generator from 2 (ncols + 64) / 64 + margin products by B. Every step can only lose
+    rank, so the result is a lower bound, equal to rank(A) with high probability; see certified for a second run.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, ncols: int, seed=None, oversampling: int = WORD_BITS,
+                 hashes: int = 3, margin: int = 16):
+        self.indptr, self.indices, self.ncols = indptr, indices, ncols
+        rng = np.random.default_rng(seed)
+        self.size = ncols + oversampling
+        buckets = rng.integers(0, self.size, (len(indptr) - 1, hashes)).ravel()
+        bucket_indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(buckets, minlength=self.size), out=bucket_indptr[1:])
+        # the rows of A bucket by bucket, and their entries one after the other
+        rows = np.argsort(buckets, kind="stable") // hashes
+        lengths = np.diff(indptr)[rows]
+        ends = np.concatenate(([0], np.cumsum(lengths)))
+        self.hashed_indptr = ends[bucket_indptr]
+        self.hashed_indices = indices[np.repeat(indptr[rows] - ends[:-1], lengths) + np.arange(ends[-1])]
+        self.x, self.y = rng.integers(0, np.iinfo(np.uint64).max, (2, self.size), dtype=np.uint64, endpoint=True)
+        self.matvecs = 0
+        x_csr = _bits_csr(unpack_bits(self.x[:, None], WORD_BITS).T)
+        sequence = np.zeros((2 * num_words(self.size) + margin, WORD_BITS), dtype=np.uint64)
+        block = self.apply(self.y)
+        for i in range(len(sequence)):
+            sequence[i] = multiply_csr(*x_csr, block[:, None])[:, 0]
+            block = self.apply(block)
+        self.degrees, self.coefficients = minimal_generator(sequence)
+
+    @property
+    def rank(self) -> int:
+        return int(self.degrees.sum())
+
+    def apply(self, block: np.ndarray) -> np.ndarray:
+        """
+        B times a block of 64 vectors of length ncols + 64, one word per row
+        """
+        self.matvecs += 1
+        return multiply_csr(self.hashed_indptr, self.hashed_indices, block[:self.ncols, None])[:, 0]
+
+    def kernel_vectors(self) -> np.ndarray:
+        """
+        Vectors of ker(A) as packed rows, at most 64 and usually spanning min(64, dim ker(A)) dimensions:
+        the w_g = sum_j B^j Y f_{g,j}, for which B w_g = sum_j B^j (B Y) f_{g,j} vanishes with high probability.
+        Each is checked exactly against A, and the zero ones are dropped.
+        """
+        y_csr = _bits_csr(unpack_bits(self.y[:, None], WORD_BITS))
+        # Horner's rule from the highest degree, column g of the block being w_g
+        top = self.coefficients.shape[1] - 1
+        block = np.zeros(self.size, dtype=np.uint64)
+        for j in range(top, -1, -1):
+            selection = _transpose_blocks(self.coefficients[:, j][None])[0]
+            block = (self.apply(block) if j < top else block) ^ multiply_csr(*y_csr, selection[:, None])[:, 0]
+        block = block[:self.ncols]
+        images = np.bitwise_or.reduce(multiply_csr(self.indptr, self.indices, block[:, None])[:, 0])
+        vectors = transpose(block[:, None], WORD_BITS)
+        keep = ~unpack_bits(np.array([[images]], dtype=np.uint64), WORD_BITS)[0].astype(bool) & vectors.any(axis=1)
+        return vectors[keep]
+
+
+def certified(run: Callable[[int], T], certify: bool = False, seed=None, key: Callable[[T], object] = None,
+              max_runs: int = 8) -> T:
+    """
+    Calls run(seed) for a randomized computation such as a BlockWiedemann. With certify it is repeated with
+    independent seeds until two runs agree on key(result), the whole result by default, so a single unlucky run
+    cannot go unnoticed
+    """
+    key = key or (lambda result: result)
+    seen = []
+    for child in np.random.SeedSequence(seed).spawn(max_runs if certify else 1):
+        result = run(int(child.generate_state(1)[0]))
+        if not certify or key(result) in seen:
+            return result
+        seen.append(key(result))
+    raise RuntimeError("no two of " + str(max_runs) + " randomized runs agreed")
@@ -0,0 +1,185 @@
+"""
+Opt-in records of the phases of the search and rank pipelines.
+
+Every phase emits one JSON object per line with its name, the wall time, the resident memory of the
+process at its start and end, how much the peak resident memory of the process grew during the phase,
+and the sizes the caller attaches, e.g. matrix dimensions and nonzeros:
+
+    {"phase": "calculate_dims/kernel", "n": 12, "rows": 1709, "cols": 299, "nnz": 7040, "seconds": 0.01,
+     "rss_start_mb": 61.2, "rss_end_mb": 63.0, "peak_rss_growth_mb": 1.8, ...}
+
+The peak only ever grows over the life of a process, so a phase that stays below an earlier peak shows
+no growth; its own footprint is then visible in rss_end_mb - rss_start_mb.
+
+Recording is off by default, and then phase() hands out a shared no-op object, so instrumented code
+pays one function call per phase. It is switched on with enable(), or for every process, pool workers
+included, by setting QUADPROD_TRACE to a file name or to "-" for stderr.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator, Optional, Union
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+_sink: Optional[IO] = None
+
+
+def enable(target: Union[str, IO] = "-"):
+    """
+    Starts writing records to the file named target, appending, or to a stream; "-" is stderr
+    """
+    global _sink
+    disable()
+    if target == "-":
+        _sink = sys.stderr
+    elif isinstance(target, str):
+        _sink = open(target, "a")
+    else:
+        _sink = target
+
+
+def disable():
+    global _sink
+    if _sink is not None and _sink not in (sys.stderr, sys.stdout):
+        _sink.close()
+    _sink = None
+
+
+def enabled() -> bool:
+    return _sink is not None
+
+
+def rss_mb() -> Optional[float]:
+    """
+    The current resident memory of the process, from /proc on Linux
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    The largest resident memory of the process so far
+    """
+    if resource is None:
+        return None
+    # kilobytes on Linux, bytes on macOS
+    scale = 1 << 20 if sys.platform == "darwin" else 1 << 10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def emit(record: dict):
+    if _sink is None:
+        return
+    _sink.write(json.dumps(record, default=int) + "\n")
+    _sink.flush()
+
+
+def event(name: str, **fields):
+    """
+    A record without timing, for progress and results
+    """
+    if _sink is not None:
+        emit({"phase": name, "pid": os.getpid(), "time": time.time(), **fields})
+
+
+class Phase:
+    """
+    Times a with-block and emits its record on exit, with the fields given, set or added on the way
+    """
+    __slots__ = ("name", "fields", "start", "start_rss", "start_peak")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self) -> "Phase":
+        self.start_rss = rss_mb()
+        self.start_peak = peak_rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        peak = peak_rss_mb()
+        emit({"phase": self.name, "pid": os.getpid(), "time": time.time(), **self.fields, "seconds": seconds,
+              "rss_start_mb": self.start_rss, "rss_end_mb": rss_mb(),
+              "peak_rss_growth_mb": None if peak is None else peak - self.start_peak})
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def add(self, field: str, value):
+        self.fields[field] = self.fields.get(field, 0) + value
+
+    @contextmanager
+    def timer(self, field: str):
+        """
+        Adds the time spent in the with-block to field, for sub-phases that alternate inside a loop
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(field, time.perf_counter() - start)
+
+    def timed_iter(self, field: str, iterable: Iterable) -> Iterator:
+        """
+        Adds the time spent producing every item of iterable to field
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(field, time.perf_counter() - start)
+                return
+            self.add(field, time.perf_counter() - start)
+            yield item
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullPhase":
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def add(self, field: str, value):
+        pass
+
+    def timer(self, field: str) -> "_NullPhase":
+        return self
+
+    def timed_iter(self, field: str, iterable: Iterable) -> Iterable:
+        return iterable
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name: str, **fields) -> Union[Phase, _NullPhase]:
+    """
+    with phase("upperbound_rank", n=n) as record: ... record.set(rank=rank)
+    """
+    return _NULL_PHASE if _sink is None else Phase(name, fields)
+
+
+if os.environ.get("QUADPROD_TRACE"):
+    enable(os.environ["QUADPROD_TRACE"])
@@ -0,0 +1,241 @@
+"""
+Multilinear polynomials over F_2 with x_i^2 = x_i.
+
+A monomial x_{i_1} * ... * x_{i_d} is stored as the mask with bits i_1, ..., i_d set, so the
+product of two monomials is the bitwise OR of their masks. A Polynomial is the sorted uint64
+array of masks whose coefficient is 1, over at most 64 variables; equal products cancel in pairs.
+Short products, and products with more variables, are computed on plain Python ints instead.
+
+Over n <= TRUTH_TABLE_MAX_VARIABLES variables a polynomial can also be held as its truth table, the
+2^n values bit-packed into 64-bit words: bit x of the table is the value at the assignment x, read as
+a mask of the variables set to 1. The Moebius transform maps the coefficients to the truth table and
+back, so dense polynomials are multiplied as the AND of their truth tables.
+"""
+
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+MAX_VARIABLES = 64
+TRUTH_TABLE_MAX_VARIABLES = 24
+MAX_TABLE_WORDS = 1 << 22 # words of the truth tables transformed at once by multiply_many
+# the time of one word of one Moebius transform pass and the fixed time of handling one truth table, relative to one
+# term of a sparse product, as measured with numpy 2 on x86-64
+TRUTH_TABLE_WORD_COST = 0.04
+TRUTH_TABLE_OVERHEAD = 1000
+# products of at most this many pairs of terms are cheaper on Python ints than through numpy
+SMALL_PRODUCT_PAIRS = 1024
+
+# the bits of a word whose position has bit i clear, for i < 6
+_LOW_HALVES = [np.uint64(m) for m in (0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F,
+                                      0x00FF00FF00FF00FF, 0x0000FFFF0000FFFF, 0x00000000FFFFFFFF)]
+
+
+def monomial_to_mask(mon: Tuple[int, ...]) -> int:
+    """
+    Converts a monomial given as a tuple of variable indices into its bitmask, a Python int of any size
+    """
+    mask = 0
+    for i in mon:
+        mask |= 1 << i
+    return mask
+
+
+def mask_to_monomial(mask: int) -> Tuple[int, ...]:
+    """
+    Converts a bitmask into the sorted tuple of variable indices of the monomial
+    """
+    mask = int(mask)
+    mon = []
+    while mask:
+        low = mask & -mask
+        mon.append(low.bit_length() - 1)
+        mask ^= low
+    return tuple(mon)
+
+
+def multiply_masks(masks1: Iterable[int], masks2: Iterable[int]) -> List[int]:
+    """
+    The sorted masks of the product of two polynomials given by Python int masks, over any number of variables
+    """
+    masks2 = list(masks2)
+    terms = set()
+    for a in masks1:
+        for b in masks2:
+            mask = a | b
+            if mask in terms:
+                terms.remove(mask)
+            else:
+                terms.add(mask)
+    return sorted(terms)
+
+
+def multiply_tuples(poly1: Iterable[Tuple[int, ...]], poly2: Iterable[Tuple[int, ...]],
+                    method: str = "auto") -> List[Tuple[int, ...]]:
+    """
+    The product of two polynomials in the list-of-tuples representation of the scripts. Products of at most
+    SMALL_PRODUCT_PAIRS pairs of terms, or with variables beyond the 64 of a Polynomial, are computed by multiply_masks
+    unless method is "truth_table"; the others by the method multiply_many picks.
+    """
+    masks1 = [monomial_to_mask(mon) for mon in poly1]
+    masks2 = [monomial_to_mask(mon) for mon in poly2]
+    wide = max(masks1 + masks2, default=0).bit_length() > MAX_VARIABLES
+    if method != "truth_table" and (wide or len(masks1) * len(masks2) <= SMALL_PRODUCT_PAIRS):
+        product = multiply_masks(masks1, masks2)
+    else:
+        product = Polynomial.from_masks(masks1).multiply(Polynomial.from_masks(masks2), method).masks()
+    return sorted(mask_to_monomial(mask) for mask in product)
+
+
+def odd_masks(masks: np.ndarray) -> np.ndarray:
+    """
+    Sorts the masks and keeps the ones that occur an odd number of times
+    """
+    masks = np.sort(masks, kind="stable")
+    if len(masks) < 2:
+        return masks
+    starts = np.flatnonzero(np.concatenate(([True], masks[1:] != masks[:-1])))
+    counts = np.diff(np.append(starts, len(masks)))
+    return masks[starts[counts & 1 == 1]]
+
+
+def num_variables(masks: np.ndarray) -> int:
+    """
+    The smallest n such that the masks only use the variables x_0..x_{n-1}
+    """
+    return int(np.bitwise_or.reduce(masks)).bit_length() if len(masks) else 0
+
+
+def moebius_transform(tables: np.ndarray, n: int) -> np.ndarray:
+    """
+    Transforms bit-packed tables of 2^n bits in place, along the last axis: bit x becomes the XOR of the bits y
+    with y a subset of x. It maps the coefficients of a polynomial to its truth table and, being an involution over F_2,
+    the truth table back to the coefficients.
+    """
+    for i in range(min(n, 6)):
+        tables ^= (tables & _LOW_HALVES[i]) << np.uint64(1 << i)
+    for i in range(6, n):
+        halves = tables.reshape(tables.shape[:-1] + (-1, 2, 1 << (i - 6)))
+        halves[..., 1, :] ^= halves[..., 0, :]
+    return tables
+
+
+def truth_tables(polys: Sequence["Polynomial"], n: int) -> np.ndarray:
+    """
+    The bit-packed truth tables of polynomials over n variables, one row of max(1, 2^n / 64) words each
+    """
+    if n > TRUTH_TABLE_MAX_VARIABLES:
+        raise ValueError("truth tables over " + str(n) + " variables are too large")
+    words = max(1, (1 << n) >> 6)
+    tables = np.zeros((len(polys), words), dtype=np.uint64)
+    rows = np.repeat(np.arange(len(polys)), [len(poly) for poly in polys])
+    terms = np.concatenate([poly.terms for poly in polys]) if polys else np.zeros(0, dtype=np.uint64)
+    if num_variables(terms) > n:
+        raise ValueError("a polynomial has variables beyond the first " + str(n))
+    np.bitwise_or.at(tables, (rows, (terms >> np.uint64(6)).astype(np.int64)), np.uint64(1) << (terms & np.uint64(63)))
+    return moebius_transform(tables, n)
+
+
+def from_truth_tables(tables: np.ndarray, n: int) -> List["Polynomial"]:
+    """
+    The polynomials of bit-packed truth tables over n variables; the tables are overwritten
+    """
+    moebius_transform(tables, n)
+    polys = []
+    for table in tables:
+        words = np.flatnonzero(table)
+        bits = np.unpackbits(table[words].astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        word, bit = np.nonzero(bits)
+        polys.append(Polynomial((words[word] * 64 + bit).astype(np.uint64)))
+    return polys
+
+
+def multiply_many(p: "Polynomial", qs: Sequence["Polynomial"], method: str = "auto") -> List["Polynomial"]:
+    """
+    The products p * q for all q in qs. method is "sparse" for the OR of all pairs of terms, "truth_table" for the AND of
+    the truth tables, or "auto" to pick the cheaper one from the number of variables and the term counts.
+    """
+    if method not in ("auto", "sparse", "truth_table"):
+        raise ValueError("unknown method " + method)
+    n = max([num_variables(p.terms)] + [num_variables(q.terms) for q in qs])
+    if method == "auto":
+        sparse_cost = len(p) * sum(len(q) for q in qs)
+        table_cost = (2 * len(qs) + 1) * (TRUTH_TABLE_OVERHEAD + TRUTH_TABLE_WORD_COST * n * max(1, (1 << n) >> 6)) \
+            if n <= TRUTH_TABLE_MAX_VARIABLES else float("inf")
+        method = "truth_table" if table_cost < sparse_cost else "sparse"
+    if method == "sparse":
+        return [p * q for q in qs]
+    p_table = truth_tables([p], n)
+    batch = max(1, MAX_TABLE_WORDS // p_table.shape[1])
+    products = []
+    for start in range(0, len(qs), batch):
+        tables = truth_tables(qs[start:start + batch], n)
+        tables &= p_table
+        products.extend(from_truth_tables(tables, n))
+    return products
+
+
+class Polynomial:
+    """
+    A polynomial over F_2 represented by the sorted uint64 array of its monomial bitmasks
+    """
+    __slots__ = ("terms",)
+
+    def __init__(self, terms: np.ndarray = None):
+        self.terms = np.zeros(0, dtype=np.uint64) if terms is None else terms
+
+    @classmethod
+    def from_masks(cls, masks: Iterable[int]) -> "Polynomial":
+        """
+        Builds a polynomial from a list of masks, repeated masks cancel in pairs
+        """
+        masks = list(masks)
+        if max(masks, default=0).bit_length() > MAX_VARIABLES:
+            raise ValueError("a monomial has a variable beyond the " + str(MAX_VARIABLES) + " of a 64-bit mask")
+        return cls(odd_masks(np.array(masks, dtype=np.uint64)))
+
+    @classmethod
+    def from_tuples(cls, poly: Iterable[Tuple[int, ...]]) -> "Polynomial":
+        """
+        Builds a polynomial from the list-of-tuples representation used by the scripts
+        """
+        return cls.from_masks(monomial_to_mask(mon) for mon in poly)
+
+    def masks(self) -> List[int]:
+        return [int(m) for m in self.terms]
+
+    def to_tuples(self) -> List[Tuple[int, ...]]:
+        """
+        Converts back to a sorted list of monomial tuples
+        """
+        return sorted(mask_to_monomial(m) for m in self.masks())
+
+    def degree(self) -> int:
+        return max((m.bit_count() for m in self.masks()), default=-1)
+
+    def multiply(self, other: "Polynomial", method: str = "auto") -> "Polynomial":
+        """
+        The product, by the method multiply_many picks
+        """
+        return multiply_many(self, [other], method)[0]
+
+    def __mul__(self, other: "Polynomial") -> "Polynomial":
+        return Polynomial(odd_masks((self.terms[:, None] | other.terms[None, :]).ravel()))
+
+    def __add__(self, other: "Polynomial") -> "Polynomial":
+        return Polynomial(np.setxor1d(self.terms, other.terms, assume_unique=True))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Polynomial) and np.array_equal(self.terms, other.terms)
+
+    def __hash__(self) -> int:
+        return hash(self.terms.tobytes())
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.masks())
+
+    def __repr__(self) -> str:
+        return "Polynomial(" + repr(self.to_tuples()) + ")"
@@ -1,54 +1,24 @@
-#!/usr/bin/env sage
+#!/usr/bin/env python3
 
 import sys
-from sage.all import *
-from itertools import product
 
+import numpy as np
 import pysat
-import pysat.card
+import pysat.formula
 import pysat.solvers
 from itertools import product, combinations
-from typing import Tuple, List, Set
+from typing import Dict, Iterable, Tuple, List, Set
 from collections import defaultdict
 
+import logging
+import multiprocessing
+import multiprocessing.connection
 import random
+import time
 
-def upperbound_rank(n: int, p: List[Tuple[int, int]]) -> int:
-    pairs_index = [(i,j) for i,j in product(range(n), range(n)) if i < j]
-    pairs_map = dict()
-    for i, (j, k) in enumerate(pairs_index):
-        pairs_map[(j,k)] = i
-
-    equations = []
-    pairs_patterns = []
-    for i, j in product(range(4), range(4)):
-        if i >= j:
-            continue
-        t = []
-        for k in range(4):
-            if k not in [i,j]:
-                t.append(k)
-        pairs_patterns.append(((i, j), tuple(t)))
-    for i,j,k,l in product(range(n), repeat=4):
-        if i >= j or j >= k or k >= l:
-            continue
-        indices = [i, j, k, l]
-        equation = []
-        for ((a, b), (c, d)) in pairs_patterns:
-            ra, rb, rc, rd = map(lambda x: indices[x], (a,b,c,d))
-            if (ra, rb) in p:
-                equation.append((rc, rd))
-        equations.append(equation)
-
-    matrix_sparse = dict()
-    for i, eq in enumerate(equations):
-        for a, b in eq:
-            matrix_sparse[i, pairs_map[(a,b)]] = 1
-
-    
-    A = matrix(GF(2), len(equations), len(pairs_index), matrix_sparse)
-    return len(pairs_index) - A.rank()
-
+from canonical import canonical_form
+from polynomial import monomial_to_mask, multiply_tuples
+from upperbound import PAIR_PATTERNS, adjacency, iter_quadruples
 
 def multiply_monomials(mon1: Tuple[int, int], mon2: Tuple[int, int]) -> Tuple[int, ...]:
     """
@@ -57,29 +27,46 @@ def multiply_monomials(mon1: Tuple[int, int], mon2: Tuple[int, int]) -> Tuple[in
     return tuple(sorted(list(set(list(mon1) + list(mon2))))) 
 
 def multiply_polynomials(poly1: List[Tuple[int,int]],
-                         poly2: List[Tuple[int,int]]) -> List[Tuple[int, ...]]:
+                         poly2: List[Tuple[int,int]], method: str = "auto") -> List[Tuple[int, ...]]:
     """
-    Multiplies two polynomials over F_2
+    Multiplies two polynomials over F_2, sparsely or through truth tables, see polynomial.multiply_tuples
     """
-    result = []
-    for a,b in product(poly1, poly2):
-        result.append(multiply_monomials(a, b))
-    result.sort()
-    final = []
-    for x in result:
-        if not final or final[-1] != x:
-            final.append(x)
-        elif final[-1] == x:
-            final = final[:-1]
-    return final
+    return multiply_tuples(poly1, poly2, method)
+
+PARITY_ENCODINGS = ("direct", "tseitin", "native")
+
 
-def generate_main_cnf(n: int):
+def xor_chain_clauses(lits: List[int], id_pool, key) -> List[List[int]]:
+    """
+    Tseitin encoding of lits[0] xor ... xor lits[-1] = 0 as a chain of auxiliary variables
+    t_i = t_{i-1} xor lits[i], 4 clauses per link, the auxiliary variables are (key, i) in id_pool
+    """
+    clauses = []
+    acc = lits[0]
+    for i, lit in enumerate(lits[1:]):
+        t = id_pool.id((key, i))
+        clauses += [[-t, acc, lit], [-t, -acc, -lit], [t, -acc, lit], [t, acc, -lit]]
+        acc = t
+    clauses.append([-acc])
+    return clauses
+
+
+def generate_main_cnf(n: int, parity_encoding: str = "direct"):
     """
         n: number of possible variables in p and q
+        parity_encoding: how the even parity of the degree-4 coefficients is encoded,
+            "direct" lists every odd sign vector (2^(k-1) clauses for k predecessors),
+            "tseitin" uses a chain of auxiliary variables (4k clauses),
+            "native" returns them as XOR constraints, only CryptoMiniSat can take those
+        Returns the clauses, the id pool and the list of XOR constraints (empty unless native),
+        every XOR constraint is a list of literals whose sum has to be 0
     """
+    if parity_encoding not in PARITY_ENCODINGS:
+        raise ValueError("unknown parity encoding " + parity_encoding)
     id_pool = pysat.formula.IDPool()
     pairs: List[List[Tuple[int, int]]] = [[], [], []]
     cnf = []
+    xors = []
     for poly_id in [1,2]:
         for i, j in product(range(n), repeat=2):
             if i >= j:
@@ -87,12 +74,13 @@ def generate_main_cnf(n: int):
             pairs[poly_id].append((i,j))
             # The variable for the coefficient of x_i * x_j
             id_pool.id((poly_id, i, j))
-    # Mapping a monomial of degree <= 4 to list of pairs (monomial in p, monomial in q)
+    # Mapping the bitmask of a monomial of degree <= 4 to list of pairs (monomial in p, monomial in q)
     # that yield the pre-image in multiplication
-    product_to_var_pair: Dict[List[int], List[Tuple[int, int]]] = defaultdict(list)
+    product_to_var_pair: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    masks = {x: monomial_to_mask(x) for x in pairs[1]}
     
     for x, y in product(pairs[1], pairs[2]):
-        product_to_var_pair[multiply_monomials(x, y)].append((x, y))
+        product_to_var_pair[masks[x] | masks[y]].append((x, y))
         #print(x, " times ", y, " is ", multiply_monomials(x, y))
         # !(1, x[0], x[1]) or !(2, y[0], y[1]) or (3, x, y)
         cnf.append([-id_pool.id((1, x[0], x[1])),
@@ -103,66 +91,337 @@ def generate_main_cnf(n: int):
 
         
     for result, predecessors in product_to_var_pair.items():
-        if len(result) != 4:
+        if result.bit_count() != 4:
             continue
         # Forbid parity 1 for the coefficients of the degree-4 monomials
-        for signs in product([0, 1], repeat=len(predecessors)):
-            if sum(signs) % 2 == 0:
+        lits = [id_pool.id((3, x, y)) for x, y in predecessors]
+        if parity_encoding == "native":
+            xors.append(lits)
+        elif parity_encoding == "tseitin":
+            cnf += xor_chain_clauses(lits, id_pool, (4, result))
+        else:
+            for signs in product([0, 1], repeat=len(lits)):
+                if sum(signs) % 2 == 0:
+                    continue
+                cnf.append([(sign * 2 - 1) * lit for lit, sign in zip(lits, signs)])
+    return cnf, id_pool, xors
+
+def check_parity_encoding(parity_encoding: str, solver_names: Iterable[str]):
+    """
+    Raises ValueError unless every solver can take the constraints of the parity encoding:
+    the XOR constraints of "native" need CryptoMiniSat
+    """
+    if parity_encoding not in PARITY_ENCODINGS:
+        raise ValueError("unknown parity encoding " + parity_encoding)
+    if parity_encoding == "native":
+        for name in solver_names:
+            if name not in pysat.solvers.SolverNames.cryptosat:
+                raise ValueError("the native parity encoding needs CryptoMiniSat, not " + name)
+
+
+def make_solver(name: str, cnf, xors):
+    """
+    Creates a pysat solver for the clauses and the XOR constraints of generate_main_cnf
+    """
+    if xors:
+        check_parity_encoding("native", [name])
+    solver = pysat.solvers.Solver(name=name, bootstrap_with=cnf)
+    for lits in xors:
+        solver.add_xor_clause(lits, value=False)
+    return solver
+
+PORTFOLIO = ("cadical153", "glucose4", "minisat22", "maplechrono")
+
+logger = logging.getLogger(__name__)
+
+
+def _portfolio_worker(name: str, cnf, xors, connection):
+    """
+    Keeps one solver of the portfolio and serves ("add", clause) and ("solve", assumptions) commands
+    """
+    solver = make_solver(name, cnf, xors)
+    while True:
+        try:
+            command, argument = connection.recv()
+        except EOFError:
+            return
+        if command == "add":
+            solver.add_clause(argument)
+        else:
+            sat = solver.solve(assumptions=argument)
+            connection.send((sat, solver.get_model() if sat else None))
+
+
+class PortfolioSolver:
+    """
+    Runs several pysat backends on the same formula, each in its own process. A solve call is sent to all
+    of them, the first answer is returned and the other processes are killed; the winner stays alive and
+    answers the following calls alone until restart() brings the killed ones back from the clause log.
+    Implements the part of the pysat solver interface MatchingSession uses.
+    """
+
+    def __init__(self, names: Iterable[str], cnf, xors=()):
+        self.names = list(names)
+        self.clauses = list(cnf)
+        self.xors = list(xors)
+        self.workers = {}
+        self.model = None
+        self.winners: List[Tuple[str, float]] = []
+        self.failed: Set[str] = set()
+        self.restart()
+
+    def restart(self):
+        """
+        Starts a process for every backend that is not running and has not failed
+        """
+        for name in self.names:
+            if name in self.workers or name in self.failed:
                 continue
-            clause = []
-            for (x, y), sign in zip(predecessors, signs):
-                clause.append((sign * 2 - 1) * id_pool.id((3, x, y)))
-            cnf.append(clause)
-    return cnf, id_pool
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_portfolio_worker, args=(name, self.clauses, self.xors, child),
+                                              daemon=True)
+            process.start()
+            child.close()
+            self.workers[name] = (process, parent)
+
+    def _kill(self, name: str):
+        process, connection = self.workers.pop(name)
+        process.kill()
+        process.join()
+        connection.close()
+
+    def add_clause(self, clause: List[int]):
+        self.clauses.append(clause)
+        for name, (process, connection) in list(self.workers.items()):
+            try:
+                connection.send(("add", clause))
+            except (BrokenPipeError, ConnectionResetError):
+                self._kill(name)
 
-def cnf_with_forced_mathcing(n: int, k :int):
+    def solve(self, assumptions: Iterable[int] = ()) -> bool:
+        start = time.perf_counter()
+        assumptions = list(assumptions)
+        for name, (process, connection) in list(self.workers.items()):
+            try:
+                connection.send(("solve", assumptions))
+            except (BrokenPipeError, ConnectionResetError):
+                self._kill(name)
+        racing = {connection: name for name, (process, connection) in self.workers.items()}
+        num_racing = len(racing)
+        while racing:
+            for connection in multiprocessing.connection.wait(list(racing)):
+                name = racing.pop(connection)
+                try:
+                    sat, self.model = connection.recv()
+                except (EOFError, ConnectionResetError):
+                    # the backend crashed or does not support the formula, e.g. XOR constraints
+                    self._kill(name)
+                    self.failed.add(name)
+                    continue
+                elapsed = time.perf_counter() - start
+                for loser in [other for other in self.workers if other != name]:
+                    self._kill(loser)
+                if num_racing > 1:
+                    logger.info("portfolio: %s won after %.3fs", name, elapsed)
+                self.winners.append((name, elapsed))
+                return sat
+        raise RuntimeError("every solver of the portfolio failed")
+
+    def get_model(self) -> List[int]:
+        return self.model
+
+    def delete(self):
+        for name in list(self.workers):
+            self._kill(name)
+
+def matching_literals(id_pool, k: int) -> List[int]:
     """
-       n: number of variables available in p and q
-       k: number of varibles in the matchings
+       The literals forcing the matching-k structure: p contains x_{4i} x_{4i+1} and q contains x_{4i+2} x_{4i+3}
+       for i < k, and the first edge of p is not in q
     """
-    cnf, id_pool = generate_main_cnf(n)
     matching1 = [(4*i, 4*i+1) for i in range(k)]
     matching2 = [(4*i+2, 4*i+3) for i in range(k)]
-    for x, y in matching1:
-        cnf.append([id_pool.id((1, x, y))])    
-    for x, y in matching2:
-        cnf.append([id_pool.id((2, x, y))])
+    lits = [id_pool.id((1, x, y)) for x, y in matching1] + [id_pool.id((2, x, y)) for x, y in matching2]
     if k > 0:
-        cnf.append([-id_pool.id((2, matching1[0][0], matching1[0][1]))])
-        cnf.append([id_pool.id((1, matching1[0][0], matching1[0][1]))])
-        
-    return cnf, id_pool
+        lits.append(-id_pool.id((2, matching1[0][0], matching1[0][1])))
+        lits.append(id_pool.id((1, matching1[0][0], matching1[0][1])))
+    return lits
 
-def solve(n: int, k :int):
+def cnf_with_forced_mathcing(n: int, k :int, parity_encoding: str = "direct"):
     """
        n: number of variables available in p and q
        k: number of varibles in the matchings
     """
-    pairs = [(i, j) for i,j in product(range(n), repeat=2) if i < j]
-    cnf, id_pool = cnf_with_forced_mathcing(n, k)
-    
-    solver = pysat.solvers.Solver(name="m22", bootstrap_with=cnf)
-    sat = solver.solve()
-    assert sat
-    assignment = solver.get_model()
-    return [a for a in pairs if id_pool.id((1, *a)) in assignment], \
-           [a for a in pairs if id_pool.id((2, *a)) in assignment]
+    cnf, id_pool, xors = generate_main_cnf(n, parity_encoding)
+    cnf += [[lit] for lit in matching_literals(id_pool, k)]
+    return cnf, id_pool, xors
+
+class MatchingSession:
+    """
+       The main CNF for a fixed n loaded once into a single solver. Matching-k and the forced edges of a query
+       are passed as assumptions, so clauses learned in one query are reused by the next ones.
+       n: number of variables available in p and q
+       portfolio: backend names to race in a PortfolioSolver instead of the single solver_name, every query
+           is raced anew and an enumeration continues on the backend that found its first model
+    """
+
+    def __init__(self, n: int, parity_encoding: str = "direct", solver_name: str = "m22",
+                 portfolio: Iterable[str] = None):
+        portfolio = None if portfolio is None else list(portfolio)
+        check_parity_encoding(parity_encoding, [solver_name] if portfolio is None else portfolio)
+        self.n = n
+        self.pairs = [(i, j) for i,j in product(range(n), repeat=2) if i < j]
+        cnf, self.id_pool, xors = generate_main_cnf(n, parity_encoding)
+        self.portfolio = portfolio is not None
+        self.solver = PortfolioSolver(portfolio, cnf, xors) if self.portfolio else make_solver(solver_name, cnf, xors)
+        self.poly_vars = [self.id_pool.id((poly_id, *a)) for poly_id in [1, 2] for a in self.pairs]
+        self.num_enumerations = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.solver.delete()
+
+    def _start_query(self):
+        if self.portfolio:
+            self.solver.restart()
+
+    def assumptions(self, k: int = 0, forced: Iterable[Tuple[int, int, int]] = (),
+                    forbidden: Iterable[Tuple[int, int, int]] = ()) -> List[int]:
+        """
+           k: number of varibles in the matchings
+           forced, forbidden: coefficients (poly_id, i, j) set to 1 resp. 0, poly_id is 1 for p and 2 for q
+        """
+        return matching_literals(self.id_pool, k) + [self.id_pool.id(c) for c in forced] \
+            + [-self.id_pool.id(c) for c in forbidden]
+
+    def decode(self, assignment: List[int]) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        assignment = set(assignment)
+        return [a for a in self.pairs if self.id_pool.id((1, *a)) in assignment], \
+               [a for a in self.pairs if self.id_pool.id((2, *a)) in assignment]
+
+    def solve(self, k: int = 0, forced=(), forbidden=()):
+        """
+           Returns some (p, q) for the query, None if there is none
+        """
+        self._start_query()
+        if not self.solver.solve(assumptions=self.assumptions(k, forced, forbidden)):
+            return None
+        return self.decode(self.solver.get_model())
+
+    def vertex_symmetries(self, k: int = 0, forced=(), forbidden=()) -> List[List[int]]:
+        """
+           Permutations of the variables generating symmetries of the query: the transpositions of neighbouring
+           variables and the swaps of neighbouring blocks of four that map the forced and forbidden
+           coefficients of the query onto themselves. The main CNF is invariant under any renaming.
+        """
+        fixed = set()
+        for lit in self.assumptions(k, forced, forbidden):
+            poly_id, i, j = self.id_pool.obj(abs(lit))
+            fixed.add((lit > 0, poly_id, i, j))
+        candidates = []
+        for a in range(self.n - 1):
+            perm = list(range(self.n))
+            perm[a], perm[a + 1] = a + 1, a
+            candidates.append(perm)
+        for b in range(self.n // 4 - 1):
+            perm = list(range(self.n))
+            perm[4*b:4*b + 8] = perm[4*b + 4:4*b + 8] + perm[4*b:4*b + 4]
+            candidates.append(perm)
+        return [perm for perm in candidates
+                if {(sign, poly_id, *sorted((perm[i], perm[j]))) for sign, poly_id, i, j in fixed} == fixed]
+
+    def lex_leader_clauses(self, perm: List[int], guard: int, key) -> List[List[int]]:
+        """
+           Clauses allowing only assignments X of the p and q coefficients with X >= perm(X) lexicographically
+           when guard is true, X listed in the order of poly_vars. Auxiliary variables e_i, keyed by (key, i), state
+           that the first i moved coefficients agree with their images, the guard plays the role of e_0.
+        """
+        index = {v: position for position, v in enumerate(self.poly_vars)}
+        pairs = []
+        for v in self.poly_vars:
+            poly_id, i, j = self.id_pool.obj(v)
+            image = self.id_pool.id((poly_id, *sorted((perm[i], perm[j]))))
+            if index[image] > index[v]:
+                pairs.append((v, image))
+        clauses = []
+        equal = guard
+        for position, (x, y) in enumerate(pairs):
+            clauses.append([-equal, x, -y])
+            if position + 1 < len(pairs):
+                following = self.id_pool.id((key, position))
+                clauses.append([-equal, -x, -y, following])
+                clauses.append([-equal, x, y, following])
+                equal = following
+        return clauses
+
+    def generate_all(self, k: int = 0, forced=(), forbidden=(), symmetry_breaking: bool = False):
+        """
+           Enumerates all (p, q) of the query. The blocking clauses are guarded by a fresh activation literal
+           that is switched off afterwards, so they do not constrain later queries.
+           With symmetry_breaking, lex-leader constraints for vertex_symmetries are added under the same guard
+           and only one (p, q) of every class of canonical.canonical_form is yielded.
+        """
+        self.num_enumerations += 1
+        act = self.id_pool.id(("enumeration", self.num_enumerations))
+        assumptions = self.assumptions(k, forced, forbidden) + [act]
+        seen = set()
+        self._start_query()
+        if symmetry_breaking:
+            for g, perm in enumerate(self.vertex_symmetries(k, forced, forbidden)):
+                for clause in self.lex_leader_clauses(perm, act, ("lex", self.num_enumerations, g)):
+                    self.solver.add_clause(clause)
+        try:
+            while self.solver.solve(assumptions=assumptions):
+                model = self.solver.get_model()
+                self.solver.add_clause([-act] + [-model[v - 1] for v in self.poly_vars])
+                p, q = self.decode(model)
+                if symmetry_breaking:
+                    form = canonical_form(self.n, p, q)
+                    if form in seen:
+                        continue
+                    seen.add(form)
+                yield p, q
+        finally:
+            self.solver.add_clause([-act])
+
+    def sweep(self, ks: Iterable[int] = None):
+        """
+           Solves matching-k for every k in ks, by default 0..n/4, yields (k, solution or None)
+        """
+        for k in range(self.n // 4 + 1) if ks is None else ks:
+            yield k, self.solve(k)
 
-def generate_all(n: int, k: int):
+def solve(n: int, k: int, parity_encoding: str = "direct", solver_name: str = "m22",
+          portfolio: Iterable[str] = None):
     """
-       Enumerates all solutions for the matching-k problem
        n: number of variables available in p and q
        k: number of varibles in the matchings
+       portfolio: backends to race instead of solver_name, e.g. PORTFOLIO
     """
-    pairs = [(i, j) for i,j in product(range(n), repeat=2) if i < j]
-    cnf, id_pool = cnf_with_forced_mathcing(n, k)
-    
-    solver = pysat.solvers.Solver(name="m22", bootstrap_with=cnf)
-    sat = solver.solve()
-    assert sat
-    for assignment in solver.enum_models():
-        yield [a for a in pairs if id_pool.id((1, *a)) in assignment], \
-              [a for a in pairs if id_pool.id((2, *a)) in assignment]  
+    with MatchingSession(n, parity_encoding, solver_name, portfolio) as session:
+        solution = session.solve(k)
+    assert solution is not None
+    return solution
+
+def generate_all(n: int, k: int, parity_encoding: str = "direct", solver_name: str = "m22",
+                 symmetry_breaking: bool = False, portfolio: Iterable[str] = None):
+    """
+       Enumerates all solutions for the matching-k problem, up to renaming of the variables with symmetry_breaking
+       n: number of variables available in p and q
+       k: number of varibles in the matchings
+       portfolio: backends to race for the first model instead of solver_name, e.g. PORTFOLIO
+    """
+    with MatchingSession(n, parity_encoding, solver_name, portfolio) as session:
+        found = False
+        for solution in session.generate_all(k, symmetry_breaking=symmetry_breaking):
+            found = True
+            yield solution
+        assert found
 
 
 
@@ -199,46 +458,31 @@ def print_tex(n: int, k: int, p: List[Tuple[int, int]], q: List[Tuple[int, int]]
     #     print()
     print()
 
-def find_local_patterns(n: int, k: int, p: List[Tuple[int, int]], q: List[Tuple[int, int]]) -> Set[str]:
-    local_patterns = set()
-    for i1, i2, j1, j2 in product(range(n), repeat=4):
-        if i1 >= i2 or i2 >= j1 or j1 >= j2:
-            continue
-        
-        local_patterns.add("".join([pair_to_letter(x, y) for x,y in
-                                            [(i1, i2), (i1, j1), (i1, j2), 
-                                            (i2, j1), (i2, j2), (j1, j2)]]))
-    return local_patterns
-
-
-
+PATTERN_LETTERS = ".PQB"
 
-exit(0)
+def local_pattern_census(n: int, p: List[Tuple[int, int]], q: List[Tuple[int, int]],
+                         chunk_rows: int = 1 << 16) -> Dict[str, int]:
+    """
+       Counts the local patterns of (p, q) over all 4-subsets i1 < i2 < j1 < j2: the letters of pair_to_letter
+       for the pairs (i1, i2), (i1, j1), (i1, j2), (i2, j1), (i2, j2), (j1, j2). The 4-subsets are classified in
+       chunks of chunk_rows with a grid holding the letter index of every pair, each pattern as a base-4 code.
+    """
+    grid = adjacency(n, p) * 1 + adjacency(n, q) * 2
+    counts = np.zeros(len(PATTERN_LETTERS) ** 6, dtype=np.int64)
+    for quads in iter_quadruples(n, chunk_rows):
+        codes = np.zeros(len(quads), dtype=np.int64)
+        for (a, b), _ in PAIR_PATTERNS:
+            codes = codes * len(PATTERN_LETTERS) + grid[quads[:, a], quads[:, b]]
+        counts += np.bincount(codes, minlength=len(counts))
+    census = {}
+    for code in np.flatnonzero(counts).tolist():
+        letters = []
+        rest = code
+        for _ in range(6):
+            rest, letter = divmod(rest, len(PATTERN_LETTERS))
+            letters.append(PATTERN_LETTERS[letter])
+        census["".join(reversed(letters))] = int(counts[code])
+    return census
 
-for n,k in [(40, 1)]:   
-    #try: 
-    print(n, k)
-    for i, (p, q) in enumerate(generate_all(n, k)):
-        print("i=",i)
-        print_tex(n, k, p, q)
-        print('RANK with fixed p: ', upperbound_rank(n, p))
-        print('RANK with fixed q: ', upperbound_rank(n, q))
-        
-    """for pattern in local_patterns:
-        if not ('P' in pattern and 'Q' in pattern):
-            continue
-        pairs_index = [(i,j) for i, j in product(range(4), repeat=2) if i < j]
-        p0 = [(i, j) for k, (i, j) in enumerate(pairs_index) if pattern[k] in ['P', 'B']]
-        q0 = [(i, j) for k, (i, j) in enumerate(pairs_index) if pattern[k] in ['Q', 'B']]
-        
-        print(pattern[:3])
-        print('#' + pattern[3:5])
-        print('##' + pattern[5])
-        print('product=', multiply_polynomials(p0, q0))
-        print()"""
-    print(len(multiply_polynomials(p, q)))
-    print("There are no degree-4 monomials: ", all(lambda x: len(x) <= 3 for x in multiply_polynomials(p, q)))
-    print(p)
-    #except Exception as e:
-    #    print(n, k, " doesn't work")
-                    
+def find_local_patterns(n: int, k: int, p: List[Tuple[int, int]], q: List[Tuple[int, int]]) -> Set[str]:
+    return set(local_pattern_census(n, p, q))
@@ -0,0 +1,99 @@
+"""
+A persistent cache for rank computations on a polynomial p over n variables.
+
+The results only depend on p up to renaming the variables, so entries are keyed by n and
+canonical.canonical_polynomial(n, p): isomorphic inputs share one entry. Witness polynomials are stored
+in the canonical names of the variables and renamed back for the p that is looked up. Entries live in
+an SQLite file, shared between scripts and runs, with an in-memory LRU of recent entries in front.
+"""
+
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from canonical import canonical_polynomial
+
+DEFAULT_PATH = os.environ.get("QUADPROD_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "quadprod", "ranks.sqlite"))
+
+
+class RankCache:
+    """
+    Maps (kind, n, canonical form of p) to a JSON value and an optional witness polynomial.
+    kind names the computation, e.g. "upperbound_rank" or "dims". The SQLite connection is opened lazily
+    in every process, so a cache can be passed to process pool workers.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, lru_size: int = 4096):
+        self.path = path
+        self.lru_size = lru_size
+        self.lru = OrderedDict()
+        self._connection = None
+        self._pid = None
+
+    def __getstate__(self):
+        return {"path": self.path, "lru_size": self.lru_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["lru_size"])
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results (kind TEXT, n INTEGER, key BLOB, value TEXT, "
+                                     "witness TEXT, PRIMARY KEY (kind, n, key))")
+            self._pid = os.getpid()
+        return self._connection
+
+    def _remember(self, entry_key, entry):
+        self.lru[entry_key] = entry
+        self.lru.move_to_end(entry_key)
+        while len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def get(self, kind: str, n: int, p: Iterable[Tuple[int, ...]]):
+        """
+        Returns (value, witness) for p, the witness in the variables of p, or None if there is no entry
+        """
+        key, relabel = canonical_polynomial(n, p)
+        entry_key = (kind, n, key)
+        if entry_key in self.lru:
+            entry = self.lru[entry_key]
+            self.lru.move_to_end(entry_key)
+        else:
+            row = self._db().execute("SELECT value, witness FROM results WHERE kind = ? AND n = ? AND key = ?",
+                                     (kind, n, key)).fetchone()
+            if row is None:
+                return None
+            entry = (json.loads(row[0]), None if row[1] is None else [tuple(mon) for mon in json.loads(row[1])])
+            self._remember(entry_key, entry)
+        value, witness = entry
+        return value, _rename(witness, np.argsort(relabel))
+
+    def put(self, kind: str, n: int, p: Iterable[Tuple[int, ...]], value, witness: Optional[List[Tuple[int, ...]]] = None):
+        """
+        Stores value and the witness, given in the variables of p
+        """
+        key, relabel = canonical_polynomial(n, p)
+        witness = _rename(witness, relabel)
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                       (kind, n, key, json.dumps(value), None if witness is None else json.dumps(witness)))
+        self._remember((kind, n, key), (value, witness))
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _rename(poly: Optional[List[Tuple[int, ...]]], names: np.ndarray) -> Optional[List[Tuple[int, ...]]]:
+    if poly is None:
+        return None
+    return sorted(tuple(sorted(int(names[i]) for i in mon)) for mon in poly)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from compute_pq_rank import MultiplyingMatrixBuilder, calculate_dims, generate_equations, multiply_polynomials
+
+
+def assert_same_matrices(left, right):
+    for (indptr, indices), (other_indptr, other_indices) in zip(left, right):
+        assert np.array_equal(indptr, other_indptr)
+        assert np.array_equal(indices, other_indices)
+
+
+def test_grow_past_the_variables_of_p_matches_a_fresh_build():
+    p = [(0, 5), (1, 2, 3)]
+    builder = MultiplyingMatrixBuilder(p)
+    builder.grow(4)
+    builder.grow(7)
+    assert_same_matrices(builder.matrices(), generate_equations(7, p))
+    assert (builder.rows_high, builder.rows_low) == (33, 7)
+    assert calculate_dims(7, *builder.matrices())[:2] == (32, 4)
+
+
+def test_grow_step_by_step_matches_a_fresh_build():
+    p = [(0, 1, 2), (0, 3), (1, 4), (2, 3, 4), (1, 2), (4,)]
+    builder = MultiplyingMatrixBuilder(p)
+    for n in range(5, 12):
+        builder.grow(n)
+        assert_same_matrices(builder.matrices(), generate_equations(n, p))
+
+
+def test_wiedemann_backend_matches_gf2():
+    p = [(0, 1, 2), (0, 3), (1, 4), (2, 3, 4), (1, 2), (4,)]
+    builder = MultiplyingMatrixBuilder(p)
+    for n in [8, 12]:
+        builder.grow(n)
+        expected = calculate_dims(n, *builder.matrices())[:2]
+        dim_of_qs, dim_of_prod, q = calculate_dims(n, *builder.matrices(), backend="wiedemann", certify=True)
+        assert (dim_of_qs, dim_of_prod) == expected
+        product = multiply_polynomials(p, q)
+        assert all(len(mon) <= 3 for mon in product)
+        assert (len(product) > 0) == (dim_of_prod > 0)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+import gf2
+
+SHAPES = [(1, 1), (5, 3), (40, 70), (130, 64), (90, 130), (300, 129)]
+
+
+def brute_force_rank(dense: np.ndarray) -> int:
+    """
+    Gaussian elimination on rows held as Python ints, keyed by their highest bit
+    """
+    basis = {}
+    for row in dense:
+        value = int("".join(map(str, row[::-1])) or "0", 2)
+        while value:
+            top = value.bit_length() - 1
+            if top not in basis:
+                basis[top] = value
+                break
+            value ^= basis[top]
+    return len(basis)
+
+
+def random_matrix(rng: np.random.Generator, nrows: int, ncols: int) -> np.ndarray:
+    """
+    A 0/1 matrix of random rank, as a product of two random matrices through a thinner middle
+    """
+    middle = int(rng.integers(0, min(nrows, ncols) + 1))
+    return (rng.integers(0, 2, (nrows, middle)) @ rng.integers(0, 2, (middle, ncols)) % 2).astype(np.uint8)
+
+
+def in_kernel(dense: np.ndarray, vectors: np.ndarray) -> bool:
+    return not (dense.astype(np.int64) @ gf2.unpack_bits(vectors, dense.shape[1]).T.astype(np.int64) % 2).any()
+
+
+def to_csr(dense: np.ndarray):
+    rows, cols = np.nonzero(dense)
+    indptr = np.zeros(len(dense) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=len(dense)))
+    return indptr, cols.astype(np.int64)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("nrows, ncols", SHAPES)
+def test_rank_and_kernel_basis(seed, nrows, ncols):
+    dense = random_matrix(np.random.default_rng(seed), nrows, ncols)
+    rows = gf2.pack_bits(dense)
+    expected = brute_force_rank(dense)
+    assert gf2.rank(rows, ncols) == expected
+    kernel = gf2.kernel_basis(rows, ncols)
+    assert len(kernel) == ncols - expected
+    assert in_kernel(dense, kernel)
+    assert gf2.rank(kernel, ncols) == len(kernel)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("nrows, ncols", SHAPES)
+def test_echelon_basis_in_chunks(seed, nrows, ncols):
+    dense = random_matrix(np.random.default_rng(seed), nrows, ncols)
+    basis = gf2.EchelonBasis(ncols)
+    for chunk in gf2.iter_csr_chunks(*to_csr(dense), ncols, chunk_rows=17):
+        basis.add_rows(chunk)
+    assert basis.rank == brute_force_rank(dense)
+    free = basis.free_columns()
+    assert len(free) == ncols - basis.rank
+    vectors = np.array([basis.kernel_vector(col) for col in free]).reshape(len(free), gf2.num_words(ncols))
+    assert in_kernel(dense, vectors)
+    assert gf2.rank(vectors, ncols) == len(free)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("nrows, ncols", SHAPES)
+def test_kernel_basis_from_csr(seed, nrows, ncols):
+    dense = random_matrix(np.random.default_rng(seed), nrows, ncols)
+    kernel = gf2.KernelBasis(ncols)
+    kernel.add_csr(*to_csr(dense))
+    assert kernel.rank == brute_force_rank(dense)
+    vectors = gf2.transpose(kernel.coordinates, kernel.dim) if kernel.dim else gf2.zeros(0, ncols)
+    assert in_kernel(dense, vectors)
+    assert gf2.rank(vectors, ncols) == kernel.dim
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("nrows, ncols", SHAPES + [(2000, 300), (0, 10)])
+def test_block_wiedemann(seed, nrows, ncols):
+    dense = random_matrix(np.random.default_rng(seed), nrows, ncols)
+    engine = gf2.BlockWiedemann(*to_csr(dense), ncols, seed=seed)
+    assert engine.rank == brute_force_rank(dense)
+    vectors = engine.kernel_vectors()
+    assert in_kernel(dense, vectors)
+    # a small kernel is spanned by the vectors
+    if ncols - engine.rank <= 32:
+        assert gf2.rank(vectors, ncols) == ncols - engine.rank
+
+
+def test_certified_repeats_until_two_runs_agree():
+    results = iter([3, 1, 4, 1, 5])
+    assert gf2.certified(lambda seed: next(results), certify=True) == 1
+    assert gf2.certified(lambda seed: 7) == 7
+    with pytest.raises(RuntimeError):
+        gf2.certified(lambda seed: seed, certify=True, max_runs=3)
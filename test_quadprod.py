@@ -0,0 +1,19 @@
+from canonical import canonical_form
+from quadprod import generate_all
+
+
+def canonical_forms(n, solutions):
+    return [canonical_form(n, p, q) for p, q in solutions]
+
+
+def test_symmetry_breaking_yields_one_solution_per_class():
+    full = set(canonical_forms(5, generate_all(5, 1)))
+    broken = canonical_forms(5, generate_all(5, 1, symmetry_breaking=True))
+    assert len(broken) == len(set(broken)) == len(full) == 504
+    assert set(broken) == full
+
+
+def test_symmetry_breaking_without_matching_counts_the_classes():
+    # 786 classes in the full enumeration, which takes about a minute
+    broken = canonical_forms(5, generate_all(5, 0, symmetry_breaking=True))
+    assert len(broken) == len(set(broken)) == 786
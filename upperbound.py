@@ -0,0 +1,378 @@
+"""
+The linear system behind upperbound_rank.
+
+Every 4-subset {i < j < k < l} of the n variables gives one equation over the pair variables
+x_{ab}, a < b: for each pair of the subset that is a monomial of the quadratic p, the
+complementary pair of the subset enters the equation. The equations are generated in
+lexicographic order of the 4-subsets, in CSR chunks, so the n^4 loop over all index tuples
+and the dict-of-keys matrix are never materialized.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, repeat
+from math import comb
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import gf2
+import instrument
+
+# pairs of positions inside a 4-subset and their complementary pairs, in the order of the equations
+PAIR_PATTERNS = [((a, b), tuple(c for c in range(4) if c not in (a, b))) for a, b in combinations(range(4), 2)]
+
+
+def num_pairs(n: int) -> int:
+    return comb(n, 2)
+
+
+def num_equations(n: int) -> int:
+    return comb(n, 4)
+
+
+def pair_index_matrix(n: int) -> np.ndarray:
+    """
+    The n x n array with the index of the pair variable (i, j), i < j, in lexicographic order, and -1 elsewhere
+    """
+    index = np.full((n, n), -1, dtype=np.int64)
+    i, j = np.triu_indices(n, 1)
+    index[i, j] = np.arange(len(i))
+    return index
+
+
+def adjacency(n: int, p: Iterable[Tuple[int, int]]) -> np.ndarray:
+    """
+    The n x n boolean matrix with True at (i, j) for every monomial x_i x_j of p, as listed in p
+    """
+    adj = np.zeros((n, n), dtype=bool)
+    p = list(p)
+    if p:
+        i, j = np.array(p, dtype=np.int64).T
+        adj[i, j] = True
+    return adj
+
+
+def iter_quadruples(n: int, chunk_rows: int = 1 << 16) -> Iterator[np.ndarray]:
+    """
+    Yields the 4-subsets i < j < k < l of range(n) in lexicographic order, as arrays of at most chunk_rows rows
+    """
+    triples = np.array(list(combinations(range(n), 3)), dtype=np.int64).reshape(-1, 3)
+    for i in range(n - 3):
+        # the triples above i form a suffix of the lexicographically sorted triples
+        first = int(np.searchsorted(triples[:, 0], i + 1))
+        for start in range(first, len(triples), chunk_rows):
+            rest = triples[start:start + chunk_rows]
+            quads = np.empty((len(rest), 4), dtype=np.int64)
+            quads[:, 0] = i
+            quads[:, 1:] = rest
+            yield quads
+
+
+def iter_equations(n: int, p: Iterable[Tuple[int, int]], chunk_rows: int = 1 << 16) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yields the equations in CSR chunks (indptr, indices) of at most chunk_rows equations each;
+    indices are pair variable indices as in pair_index_matrix
+    """
+    adj = adjacency(n, p)
+    pair_index = pair_index_matrix(n)
+    for quads in iter_quadruples(n, chunk_rows):
+        present = np.stack([adj[quads[:, a], quads[:, b]] for (a, b), _ in PAIR_PATTERNS], axis=1)
+        columns = np.stack([pair_index[quads[:, c], quads[:, d]] for _, (c, d) in PAIR_PATTERNS], axis=1)
+        indptr = np.zeros(len(quads) + 1, dtype=np.int64)
+        np.cumsum(present.sum(axis=1), out=indptr[1:])
+        yield indptr, columns[present]
+
+
+# blocks with at most this many columns are eliminated directly instead of through a KernelBasis
+SMALL_BLOCK_COLS = 256
+# nonempty equations fed to a KernelBasis at once: small chunks shrink the kernel before the bulk of the rows
+KERNEL_CHUNK_ROWS = 2048
+
+
+def equations_csr(n: int, p: Iterable[Tuple[int, int]], chunk_rows: int = 1 << 16) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The nonempty equations of p in lexicographic order as one CSR matrix (indptr, indices)
+    """
+    lengths, indices = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for chunk_indptr, chunk_indices in iter_equations(n, p, chunk_rows):
+        chunk_lengths = np.diff(chunk_indptr)
+        lengths.append(chunk_lengths[chunk_lengths > 0])
+        indices.append(chunk_indices)
+    lengths = np.concatenate(lengths)
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    return indptr, np.concatenate(indices)
+
+
+def _components(ncols: int, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Labels the columns of a CSR matrix without empty rows by their connected components, see variable_components
+    """
+    labels = np.arange(ncols)
+    lengths = np.diff(indptr)
+    while True:
+        before = labels.copy()
+        if len(lengths):
+            smallest = np.minimum.reduceat(labels[indices], indptr[:-1])
+            np.minimum.at(labels, indices, np.repeat(smallest, lengths))
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(before, labels):
+            return labels
+
+
+def variable_components(n: int, p: Iterable[Tuple[int, int]], chunk_rows: int = 1 << 16) -> np.ndarray:
+    """
+    Labels every pair variable by its connected component in the bipartite incidence graph of equations and variables,
+    the label being the smallest variable of the component. Labels are propagated as the minimum over each equation,
+    with pointer jumping, until a pass over the equations changes nothing.
+    """
+    return _components(num_pairs(n), *equations_csr(n, p, chunk_rows))
+
+
+def _kernel_rank(ncols: int, indptr: np.ndarray, indices: np.ndarray) -> int:
+    """
+    The rank of a CSR matrix through a KernelBasis fed KERNEL_CHUNK_ROWS rows at a time
+    """
+    kernel = gf2.KernelBasis(ncols)
+    for start in range(0, len(indptr) - 1, KERNEL_CHUNK_ROWS):
+        stop = min(start + KERNEL_CHUNK_ROWS, len(indptr) - 1)
+        kernel.add_csr(indptr[start:stop + 1] - indptr[start], indices[indptr[start]:indptr[stop]])
+    return kernel.rank
+
+
+def _wiedemann_rank(ncols: int, indptr: np.ndarray, indices: np.ndarray, certify: bool = False) -> int:
+    """
+    The rank of a CSR matrix through a gf2.BlockWiedemann, repeated until two runs agree with certify
+    """
+    return gf2.certified(lambda seed: gf2.BlockWiedemann(indptr, indices, ncols, seed).rank, certify)
+
+
+def _blocks_rank(blocks: List[Tuple[int, np.ndarray, np.ndarray]], backend: str, certify: bool = False) -> int:
+    """
+    The sum of the ranks of blocks given as (ncols, indptr, indices) with block-local column indices
+    """
+    total = 0
+    for ncols, indptr, indices in blocks:
+        if backend == "sage":
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            total += gf2.sage_matrix(len(indptr) - 1, ncols, {(i, j): 1 for i, j in zip(rows.tolist(), indices.tolist())}).rank()
+        elif ncols <= SMALL_BLOCK_COLS:
+            total += gf2.rank(gf2.pack_csr(indptr, indices, ncols), ncols)
+        elif backend == "wiedemann":
+            total += _wiedemann_rank(ncols, indptr, indices, certify)
+        else:
+            total += _kernel_rank(ncols, indptr, indices)
+    return total
+
+
+def upperbound_rank_by_blocks(n: int, p: Iterable[Tuple[int, int]], backend: str = "gf2", chunk_rows: int = 1 << 16,
+                              processes: Optional[int] = None, certify: bool = False) -> int:
+    """
+    upperbound_rank computed on the connected components of the incidence graph: the matrix is block diagonal
+    after permuting rows and columns, so its rank is the sum of the ranks of the blocks.
+    The equations are generated once. Blocks of at most SMALL_BLOCK_COLS columns are eliminated directly in this
+    process, larger ones through a KernelBasis (a BlockWiedemann with the wiedemann backend), in parallel on a
+    process pool with the blocks spread over the workers by their number of nonzeros when there are several large
+    blocks and none of them dominates.
+    This beats the monolithic upperbound_rank when p splits the variables into many components of moderate size;
+    with one component it falls back to the monolithic elimination on the generated equations.
+    """
+    p = list(p)
+    ncols = num_pairs(n)
+    with instrument.phase("upperbound_rank_by_blocks/components", n=n, cols=ncols) as record:
+        indptr, indices = equations_csr(n, p, chunk_rows)
+        labels = _components(ncols, indptr, indices)
+        block_size = np.bincount(labels, minlength=ncols)
+        record.set(rows=len(indptr) - 1, nnz=len(indices), components=int(np.count_nonzero(block_size)))
+    if backend != "sage" and block_size.max(initial=0) == ncols:
+        with instrument.phase("upperbound_rank_by_blocks/rank", n=n, blocks=1, processes=1):
+            return ncols - _blocks_rank([(ncols, indptr, indices)], backend, certify)
+
+    # order the equations and their entries by the component of their first variable
+    lengths = np.diff(indptr)
+    equation_labels = labels[indices[indptr[:-1]]]
+    order = np.argsort(equation_labels, kind="stable")
+    entry_order = np.repeat(indptr[:-1][order] - np.concatenate(([0], np.cumsum(lengths[order])[:-1])), lengths[order]) \
+        + np.arange(len(indices))
+    indices = indices[entry_order]
+    lengths = lengths[order]
+    equation_labels = equation_labels[order]
+
+    # number the variables inside their block
+    variable_order = np.argsort(labels, kind="stable")
+    block_start = np.searchsorted(labels[variable_order], labels)
+    local = np.empty_like(labels)
+    local[variable_order] = np.arange(len(labels)) - block_start[variable_order]
+
+    small, large = [], []
+    boundaries = np.flatnonzero(np.diff(equation_labels)) + 1
+    entry_bounds = np.concatenate(([0], np.cumsum(lengths)))
+    for first, last in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(lengths)]))):
+        if first == last:
+            continue
+        block_indptr = entry_bounds[first:last + 1] - entry_bounds[first]
+        block_indices = local[indices[entry_bounds[first]:entry_bounds[last]]]
+        block = (int(block_size[equation_labels[first]]), block_indptr, block_indices)
+        (small if block[0] <= SMALL_BLOCK_COLS and backend != "sage" else large).append(block)
+
+    instrument.event("upperbound_rank_by_blocks/blocks", n=n, blocks=len(small) + len(large), large=len(large),
+                     largest_cols=max((block[0] for block in small + large), default=0),
+                     largest_nnz=max((len(block[2]) for block in small + large), default=0))
+    processes = min(processes or os.cpu_count(), len(large))
+    large_nnz = [len(block[2]) for block in large]
+    if processes <= 1 or max(large_nnz) * 2 > sum(large_nnz):
+        with instrument.phase("upperbound_rank_by_blocks/rank", n=n, blocks=len(small) + len(large), processes=1):
+            return ncols - _blocks_rank(small + large, backend, certify)
+    # largest blocks first, each to the currently lightest worker
+    bins = [[] for _ in range(processes)]
+    loads = [0] * processes
+    for block in sorted(large, key=lambda block: -len(block[2])):
+        lightest = loads.index(min(loads))
+        bins[lightest].append(block)
+        loads[lightest] += len(block[2]) + 1
+    with instrument.phase("upperbound_rank_by_blocks/rank", n=n, blocks=len(small) + len(large), processes=processes), \
+            ProcessPoolExecutor(processes) as executor:
+        ranks = executor.map(_blocks_rank, bins, repeat(backend), repeat(certify))
+        small_rank = _blocks_rank(small, backend)
+        return ncols - small_rank - sum(ranks)
+
+
+class UpperboundSweep:
+    """
+    upperbound_rank for growing n, when p for n restricted to the first n - 1 variables is p for n - 1.
+    Going from n - 1 to n only adds the pair variables (i, n - 1) and the equations of the 4-subsets containing
+    n - 1, so the kernel is kept between the steps: the new pairs become new kernel directions and only the new
+    equations are eliminated. The pair variables are numbered in colex order, (i, j) -> j(j-1)/2 + i, so that
+    those of n - 1 variables are a prefix of those of n.
+    """
+
+    def __init__(self, chunk_rows: int = 1 << 16):
+        self.n = 0
+        self.chunk_rows = chunk_rows
+        self.adj = np.zeros((0, 0), dtype=bool)
+        self.kernel = gf2.KernelBasis(0)
+
+    @property
+    def rank(self) -> int:
+        return self.kernel.rank
+
+    @property
+    def upperbound(self) -> int:
+        return self.kernel.dim
+
+    def grow(self, n: int, p: Iterable[Tuple[int, int]]) -> int:
+        """
+        Moves to n variables with the polynomial p and returns upperbound_rank(n, p)
+        """
+        if n < self.n:
+            raise ValueError("cannot shrink from n=" + str(self.n) + " to n=" + str(n))
+        adj = adjacency(n, p)
+        if not np.array_equal(adj[:self.n, :self.n], self.adj):
+            raise ValueError("p restricted to the first " + str(self.n) + " variables changed")
+        self.adj = adj
+        for m in range(self.n, n):
+            # the pairs (i, m) and the equations of the 4-subsets whose largest variable is m
+            self.kernel.add_columns(m)
+            with instrument.phase("upperbound_sweep/step", n=m + 1, rows=comb(m, 3), cols=num_pairs(m + 1)) as record:
+                for start in range(0, comb(m, 3), self.chunk_rows):
+                    triples = _colex_triples(m, start, self.chunk_rows)
+                    quads = np.column_stack((triples, np.full(len(triples), m)))
+                    present = np.stack([adj[quads[:, a], quads[:, b]] for (a, b), _ in PAIR_PATTERNS], axis=1)
+                    columns = np.stack([quads[:, d] * (quads[:, d] - 1) // 2 + quads[:, c] for _, (c, d) in PAIR_PATTERNS],
+                                       axis=1)
+                    indptr = np.zeros(len(quads) + 1, dtype=np.int64)
+                    np.cumsum(present.sum(axis=1), out=indptr[1:])
+                    self.kernel.add_csr(indptr, columns[present])
+                record.set(dim=self.kernel.dim)
+        self.n = n
+        return self.kernel.dim
+
+
+def _colex_triples(m: int, start: int, count: int) -> np.ndarray:
+    """
+    The 3-subsets of range(m) with colex ranks start, start + 1, ... (at most count of them), as sorted rows
+    """
+    ranks = np.arange(start, min(start + count, comb(m, 3)), dtype=np.int64)
+    triples = np.empty((len(ranks), 3), dtype=np.int64)
+    for k in [3, 2, 1]:
+        # the largest c with comb(c, k) <= rank
+        table = np.array([comb(c, k) for c in range(m + 1)], dtype=np.int64)
+        c = np.searchsorted(table, ranks, side="right") - 1
+        triples[:, k - 1] = c
+        ranks = ranks - table[c]
+    return triples
+
+
+def upperbound_sweep(family: Callable[[int], Iterable[Tuple[int, int]]], ns: Iterable[int],
+                     chunk_rows: int = 1 << 16) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yields (n, rank, upperbound_rank(n, family(n))) for the increasing ns, with one UpperboundSweep,
+    so the family has to be nested: family(n) restricted to the first m variables is family(m)
+    """
+    sweep = UpperboundSweep(chunk_rows)
+    for n in ns:
+        upperbound = sweep.grow(n, family(n))
+        yield n, sweep.rank, upperbound
+
+
+def upperbound_rank(n: int, p: Iterable[Tuple[int, int]], backend: str = "gf2", chunk_rows: int = 1 << 16,
+                    blocks: bool = False, processes: Optional[int] = None, cache=None, certify: bool = False) -> int:
+    """
+    The number of pair variables minus the rank of the equations of p.
+    With blocks=True the rank is computed per connected component, see upperbound_rank_by_blocks.
+    A rank_cache.RankCache given as cache is consulted first and filled with the result.
+    The wiedemann backend is randomized and only multiplies the equations by blocks of vectors, see gf2.BlockWiedemann;
+    certify repeats it until two independent runs agree.
+    """
+    if backend not in gf2.BACKENDS:
+        raise ValueError("unknown backend " + backend)
+    p = list(p)
+    if cache is not None:
+        # only the pairs listed as (i, j) with i < j enter the equations
+        p = [(i, j) for i, j in p if i < j]
+        hit = cache.get("upperbound_rank", n, p)
+        if hit is not None:
+            return hit[0]
+        rank = upperbound_rank(n, p, backend, chunk_rows, blocks, processes, certify=certify)
+        cache.put("upperbound_rank", n, p, rank)
+        return rank
+    if blocks:
+        return upperbound_rank_by_blocks(n, p, backend, chunk_rows, processes, certify)
+    if backend == "sage":
+        matrix_sparse = dict()
+        offset = 0
+        with instrument.phase("upperbound_rank/equations", n=n, rows=num_equations(n), cols=num_pairs(n)) as record:
+            for indptr, indices in iter_equations(n, p, chunk_rows):
+                rows = offset + np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+                for i, j in zip(rows.tolist(), indices.tolist()):
+                    matrix_sparse[i, j] = 1
+                offset += len(indptr) - 1
+            record.set(nnz=len(matrix_sparse))
+        with instrument.phase("upperbound_rank/matrix", n=n, backend=backend):
+            A = gf2.sage_matrix(num_equations(n), num_pairs(n), matrix_sparse)
+        with instrument.phase("upperbound_rank/rank", n=n, backend=backend) as record:
+            rank = A.rank()
+            record.set(rank=rank)
+        return num_pairs(n) - rank
+    if backend == "wiedemann":
+        with instrument.phase("upperbound_rank/equations", n=n, rows=num_equations(n), cols=num_pairs(n)) as record:
+            indptr, indices = equations_csr(n, p, chunk_rows)
+            record.set(nnz=len(indices))
+        with instrument.phase("upperbound_rank/rank", n=n, backend=backend, certify=certify) as record:
+            rank = _wiedemann_rank(num_pairs(n), indptr, indices, certify)
+            record.set(rank=rank)
+        return num_pairs(n) - rank
+    # equations are generated and eliminated chunk by chunk, the record splits the time between the two
+    with instrument.phase("upperbound_rank", n=n, rows=num_equations(n), cols=num_pairs(n), backend=backend) as record:
+        kernel = gf2.KernelBasis(num_pairs(n))
+        for indptr, indices in record.timed_iter("equations_seconds", iter_equations(n, p, chunk_rows)):
+            with record.timer("kernel_seconds"):
+                kernel.add_csr(indptr, indices)
+            record.add("nnz", len(indices))
+        record.set(dim=kernel.dim)
+    return kernel.dim